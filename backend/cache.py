@@ -0,0 +1,149 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SubjectCache:
+    """Bounded LRU cache of per-subject topic lists and summary stats.
+
+    Every write bumps a per-subject revision counter, which is what the
+    ETags are derived from. The cache only holds data for the current
+    process, so ETags also carry a per-process epoch to stay unique
+    across restarts. Writes made by other processes are picked up through
+    observe(), which drops a subject once its stored version moves; this
+    process's own writes report theirs through observe_write().
+    """
+
+    def __init__(self, max_subjects: int = 64):
+        self.max_subjects = max_subjects
+        self.epoch = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._revisions: Dict[str, int] = {}
+        self._global_revision = 0
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def revision(self, name: str) -> int:
+        return self._revisions.get(name, 0)
+
+    def etag(self, name: str, variant: str = "") -> str:
+        """ETag of the subject's topic list; `variant` distinguishes filtered views of it"""
+        key = f"{name}?{variant}" if variant else name
+        digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+        return f'"{self.epoch}-{digest}-{self.revision(name)}"'
+
+    def summary_etag(self) -> str:
+        return f'"{self.epoch}-all-{self._global_revision}"'
+
+    def _entry(self, name: str) -> Optional[dict]:
+        entry = self._entries.get(name)
+        if entry is not None:
+            self._entries.move_to_end(name)
+        return entry
+
+    def _store(self, name: str, revision: int, **fields):
+        """Store fields for a subject unless a write happened since the read at `revision`"""
+        with self._lock:
+            if self.revision(name) != revision:
+                return
+            entry = self._entries.setdefault(name, {})
+            entry.update(fields)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_subjects:
+                self._entries.popitem(last=False)
+
+    def get_topics(self, name: str) -> Optional[List[dict]]:
+        entry = self._entry(name)
+        if entry is None or "topics" not in entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["topics"]
+
+    def set_topics(self, name: str, revision: int, topics: List[dict]):
+        completed = sum(1 for topic in topics if topic["completed"])
+        self._store(name, revision, topics=topics, total=len(topics), completed=completed)
+
+    def get_encoded(self, name: str) -> Optional[bytes]:
+        """Pre-encoded topic list body for the current revision"""
+        entry = self._entry(name)
+        if entry is None or "encoded" not in entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["encoded"]
+
+    def set_encoded(self, name: str, revision: int, body: bytes):
+        self._store(name, revision, encoded=body)
+
+    def get_summary(self, name: str) -> Optional[dict]:
+        entry = self._entry(name)
+        if entry is None or "summary" not in entry:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["summary"]
+
+    def set_summary(self, name: str, revision: int, summary: dict):
+        self._store(name, revision, summary=summary)
+
+    def apply_topic_update(self, name: str, topic_id: str, completed: bool):
+        """Write-through for a single topic change; bumps the subject revision"""
+        with self._lock:
+            self._revisions[name] = self.revision(name) + 1
+            self._global_revision += 1
+            entry = self._entries.get(name)
+            if entry is None:
+                return
+            entry.pop("encoded", None)
+            topic = next((t for t in entry.get("topics", []) if t["id"] == topic_id), None)
+            if topic is None:
+                # Without the topic list we cannot tell whether the count changed
+                del self._entries[name]
+                return
+            if topic["completed"] != completed:
+                topic["completed"] = completed
+                entry["completed"] += 1 if completed else -1
+            if "summary" in entry:
+                entry["summary"] = dict(entry["summary"], completed_topics=entry["completed"])
+
+    def invalidate(self, name: str):
+        with self._lock:
+            self._revisions[name] = self.revision(name) + 1
+            self._global_revision += 1
+            self._entries.pop(name, None)
+
+    def observe(self, name: str, version: int):
+        """Record the subject's stored version, invalidating it unless that is the version seen last"""
+        with self._lock:
+            seen = self._versions.get(name)
+            self._versions[name] = version
+        # A first observation cannot vouch for what was cached before it
+        if seen != version:
+            self.invalidate(name)
+
+    def observe_write(self, name: str, previous: int, version: int):
+        """Record the version a write of this process stored over `previous`.
+
+        The write already went through apply_topic_update, so the cache stays unless
+        some other write moved the version after it was last seen.
+        """
+        with self._lock:
+            seen = self._versions.get(name)
+            self._versions[name] = version
+        if seen != previous:
+            self.invalidate(name)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "subjects": len(self._entries),
+            "max_subjects": self.max_subjects
+        }
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Optional, Set
+
+
+class Subscription:
+    """One connected client: a bounded queue of pending events"""
+
+    def __init__(self, subject: Optional[str], queue_size: int):
+        self.subject = subject
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def wants(self, event: dict) -> bool:
+        return self.subject is None or self.subject == event.get("subject")
+
+    async def get(self) -> Optional[dict]:
+        """Next event, or None once the hub has dropped this subscriber"""
+        return await self.queue.get()
+
+
+class ProgressHub:
+    """In-process fan-out of progress deltas to WebSocket/SSE clients.
+
+    Only toggles handled by the same process reach its subscribers, which is
+    why the server runs the live endpoints on a single worker only.
+    Publishing never blocks: a subscriber whose queue is full is dropped
+    and receives None so its connection handler can close it.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, subject: Optional[str] = None) -> Subscription:
+        subscription = Subscription(subject, self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, event: dict):
+        self.published += 1
+        for subscription in list(self._subscriptions):
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription):
+        self.dropped += 1
+        subscription.dropped = True
+        self._subscriptions.discard(subscription)
+        # Make room for the sentinel so a waiting handler wakes up and closes
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": self.dropped,
+            "queue_size": self.queue_size
+        }
@@ -0,0 +1,171 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Metrics:
+    """Registry for request and Mongo command metrics, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._latency: Dict[tuple, Histogram] = {}
+        self._sizes: Dict[tuple, Histogram] = {}
+        self._status: Dict[tuple, int] = {}
+        self._mongo: Dict[tuple, Histogram] = {}
+        self._mongo_failures: Dict[tuple, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int):
+        key = (method, route)
+        with self._lock:
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._sizes[key] = Histogram(SIZE_BUCKETS)
+            self._latency[key].observe(seconds)
+            self._sizes[key].observe(size)
+            status_key = (method, route, status)
+            self._status[status_key] = self._status.get(status_key, 0) + 1
+
+    def observe_mongo(self, collection: str, command: str, seconds: float, failed: bool = False):
+        key = (collection, command)
+        with self._lock:
+            if key not in self._mongo:
+                self._mongo[key] = Histogram(LATENCY_BUCKETS)
+            self._mongo[key].observe(seconds)
+            if failed:
+                self._mongo_failures[key] = self._mongo_failures.get(key, 0) + 1
+
+    def _histogram_lines(self, name: str, histograms: Dict[tuple, Histogram], label_names: Tuple[str, ...]) -> List[str]:
+        lines = [f"# TYPE {name} histogram"]
+        quantile_lines = [f"# TYPE {name}_quantile gauge"]
+        for key, histogram in sorted(histograms.items()):
+            labels = dict(zip(label_names, key))
+            cumulative = 0
+            for bucket, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(**labels, le=bucket)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+            for q in QUANTILES:
+                quantile_lines.append(f"{name}_quantile{_labels(**labels, quantile=q)} {histogram.quantile(q)}")
+        return lines + quantile_lines
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# TYPE http_requests_total counter"
+            ]
+            for (method, route, status), count in sorted(self._status.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            lines += self._histogram_lines("http_request_duration_seconds", self._latency, ("method", "route"))
+            lines += self._histogram_lines("http_response_size_bytes", self._sizes, ("method", "route"))
+            lines += self._histogram_lines("mongo_command_duration_seconds", self._mongo, ("collection", "command"))
+            lines.append("# TYPE mongo_command_failures_total counter")
+            for (collection, command), count in sorted(self._mongo_failures.items()):
+                lines.append(f"mongo_command_failures_total{_labels(collection=collection, command=command)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template"""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            # FastAPI puts the matched route in the scope; raw paths would explode label cardinality
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            self.metrics.observe_request(scope["method"], route_path, status, time.perf_counter() - start, size)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding per-collection, per-command latencies"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._pending: Dict[tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        self._pending[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event, failed: bool):
+        collection, command = self._pending.pop((event.connection_id, event.request_id), ("-", event.command_name))
+        self.metrics.observe_mongo(collection, command, event.duration_micros / 1e6, failed)
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
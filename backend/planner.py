@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+
+def week_labels(start: date, exam: date) -> List[str]:
+    """ISO week labels from the week of `start` through the week of `exam`"""
+    monday = start - timedelta(days=start.weekday())
+    labels = []
+    while monday <= exam:
+        year, week, _ = monday.isocalendar()
+        labels.append(f"{year}-W{week:02d}")
+        monday += timedelta(weeks=1)
+    return labels
+
+
+class StudyPlanner:
+    """Spreads every student's remaining topics over the weeks left, balanced across subjects.
+
+    Students are rows and topics columns of one boolean completion matrix, laid out
+    subject by subject in curriculum order. Each remaining topic gets the fraction
+    (rank - 0.5) / remaining of its position among the student's remaining topics of
+    that subject; sorting a row by that fraction interleaves subjects in proportion to
+    what is left of each, while keeping curriculum order inside every subject. The
+    sorted position is then cut into equal week slices. Everything is done with whole
+    matrix operations, so a school costs a handful of NumPy calls rather than a loop.
+    """
+
+    def __init__(self, subjects: Dict[str, List[int]]):
+        # subject name -> bit index of each topic, in curriculum order; empty subjects have no columns
+        self.subjects = {name: indexes for name, indexes in subjects.items() if indexes}
+        sizes = [len(indexes) for indexes in self.subjects.values()]
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)))
+        self.columns = int(self.offsets[-1])
+        # Block number of every column, for per-subject sums
+        self.block = np.repeat(np.arange(len(sizes)), sizes)
+
+    def completion_matrix(self, bits: Dict[str, np.ndarray]) -> np.ndarray:
+        """Students x topics completion from per-subject progress bitsets (int64 arrays, one per subject)"""
+        students = len(next(iter(bits.values()))) if bits else 0
+        blocks = []
+        for name, indexes in self.subjects.items():
+            subject_bits = bits.get(name, np.zeros(students, dtype=np.int64)).astype(np.int64)
+            shifts = np.asarray(indexes, dtype=np.int64)
+            blocks.append((subject_bits[:, None] >> shifts[None, :]) & 1)
+        if not blocks:
+            return np.zeros((students, 0), dtype=bool)
+        return np.concatenate(blocks, axis=1).astype(bool)
+
+    def assign(self, completed: np.ndarray, weeks: int) -> np.ndarray:
+        """Week number (0-based) of every remaining topic; -1 for completed ones"""
+        if not self.columns:
+            return np.full(completed.shape, -1, dtype=np.int64)
+        students = completed.shape[0]
+        remaining = ~completed
+        counts = remaining.cumsum(axis=1)
+        # Rank of each remaining topic within its subject block, starting at 1
+        before_block = np.zeros((students, len(self.subjects)), dtype=counts.dtype)
+        before_block[:, 1:] = counts[:, self.offsets[1:-1] - 1]
+        rank = counts - before_block[:, self.block]
+        per_subject = np.add.reduceat(remaining, self.offsets[:-1], axis=1, dtype=np.int64)
+        fraction = np.where(remaining, (rank - 0.5) / np.maximum(per_subject[:, self.block], 1), np.inf)
+
+        order = np.argsort(fraction, axis=1, kind="stable")
+        # Inverse permutation: where each topic landed in its row's order
+        position = np.empty_like(order)
+        position[np.arange(students)[:, None], order] = np.arange(self.columns)
+        total = remaining.sum(axis=1, keepdims=True)
+        week = position * weeks // np.maximum(total, 1)
+        return np.where(remaining, week, -1)
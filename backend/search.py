@@ -0,0 +1,85 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+# Turkish has dotted and dotless i in both cases; str.lower() maps "I" to "i" and "İ" to "i̇"
+TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# Folded away after lowering so "sekil" finds "Şekil" and "isik" finds "Işık"
+TURKISH_ASCII = str.maketrans({"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u"})
+TOKEN = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Turkish-locale lower case without diacritics"""
+    text = text.translate(TURKISH_LOWER).lower().translate(TURKISH_ASCII)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(fold(text))
+
+
+class SearchIndex:
+    """Inverted prefix index over subject names and topic titles.
+
+    Built once from the curriculum; every prefix of every token maps to the
+    documents containing it, so a query costs a few dict lookups and set
+    intersections. Completion state is not indexed and is joined in by the caller.
+    """
+
+    def __init__(self, curriculum: Dict[str, List[str]]):
+        self.documents: List[dict] = []
+        self._tokens: List[Set[str]] = []
+        self._folded: List[str] = []
+        self._prefixes: Dict[str, Set[int]] = defaultdict(set)
+        for subject, titles in curriculum.items():
+            self._add({"type": "subject", "subject": subject, "title": subject})
+            for title in titles:
+                self._add({"type": "topic", "subject": subject, "title": title})
+        self._prefixes = dict(self._prefixes)
+
+    def _add(self, document: dict):
+        doc_id = len(self.documents)
+        tokens = set(tokenize(document["title"]))
+        self.documents.append(document)
+        self._tokens.append(tokens)
+        self._folded.append(fold(document["title"]))
+        for token in tokens:
+            for end in range(1, len(token) + 1):
+                self._prefixes[token[:end]].add(doc_id)
+
+    def _score(self, doc_id: int, terms: List[str], folded_query: str) -> float:
+        tokens = self._tokens[doc_id]
+        # Whole-word matches beat prefix matches; a title starting with the query ranks first
+        score = sum(2.0 if term in tokens else 1.0 for term in terms)
+        if self._folded[doc_id].startswith(folded_query):
+            score += 2.0
+        if self.documents[doc_id]["type"] == "subject":
+            score += 1.0
+        # Among equals, shorter titles are the more specific match
+        return score + 1.0 / (1 + len(tokens))
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[dict]:
+        """Documents containing every query term as a word prefix, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matches = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            doc_ids = self._prefixes.get(term)
+            if not doc_ids:
+                return []
+            matches = set(doc_ids) if matches is None else matches & doc_ids
+            if not matches:
+                return []
+
+        folded_query = " ".join(terms)
+        scored = sorted((-self._score(doc_id, terms, folded_query), doc_id) for doc_id in matches)
+        if limit is not None:
+            scored = scored[:limit]
+        return [dict(self.documents[doc_id], score=round(-score, 3)) for score, doc_id in scored]
+
+    def stats(self) -> dict:
+        return {"documents": len(self.documents), "prefixes": len(self._prefixes)}
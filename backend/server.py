@@ -1,25 +1,107 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from starlette.middleware.cors import CORSMiddleware
+from starlette.websockets import WebSocketState
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from bson.int64 import Int64
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import uuid
-from datetime import datetime
+import csv
+import io
+import json
+import asyncio
+import hashlib
+import numpy as np
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder renders the same bytes, only slower
+    orjson = None
+
+from cache import SubjectCache
+from events import ProgressHub
+from metrics import Metrics, MetricsMiddleware, MongoCommandMetrics
+from planner import StudyPlanner, week_labels
+from search import SearchIndex
+from storage import (REVISION_SCALE, MotorStorage, Storage, SubjectNotFound, TopicNotFound, create_storage,
+                     next_rev, select_topics)
+from timeline import PERIOD_FORMATS, RebuildInProgress, Timeline, topic_event
+from writebehind import WriteBehindBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Request and Mongo command metrics, served at /api/metrics
+metrics = Metrics()
+
+# MongoDB connection, opened by connect() from the app lifespan so importing needs no MONGO_URL.
+# Every worker process gets its own pool: size MONGO_MAX_POOL_SIZE x workers against the server limit.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+# Append-only toggle log with daily/weekly rollups for progress charts
+TIMELINE_TZ = ZoneInfo(os.environ.get('TIMELINE_TZ', 'Europe/Istanbul'))
+ROLLUP_INTERVAL = float(os.environ.get('ROLLUP_INTERVAL', 5))
+timeline: Optional[Timeline] = None
+rollup_task: Optional[asyncio.Task] = None
+
+# Set once warm-up is done and cleared when shutdown starts, for /api/health/ready
+ready = False
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 2))
+
+# Subject topic lists and summaries, kept in sync by the write paths
+subject_cache = SubjectCache(int(os.environ.get('CACHE_MAX_SUBJECTS', 64)))
+
+# Every worker process keeps its own subject_cache; a background task checks the stored
+# subject versions every CACHE_REVALIDATE_MS, so writes made through other workers show up
+# within that interval without any request waiting on the check. 0 turns it off when a
+# single process owns the database
+CACHE_REVALIDATE_MS = int(os.environ.get('CACHE_REVALIDATE_MS', 1000))
+revalidate_task: Optional[asyncio.Task] = None
+
+# Opt-in: serve topic lists as pre-encoded JSON, cached per subject revision
+FAST_TOPICS = os.environ.get('FAST_TOPICS', '0') == '1'
+
+# Live progress deltas for WebSocket/SSE subscribers. The hub fans out within one process,
+# so a client would miss toggles handled by other workers: connect() refuses WEB_CONCURRENCY
+# above 1 unless PROGRESS_EVENTS=0 turns the live endpoints off
+PROGRESS_EVENTS = os.environ.get('PROGRESS_EVENTS', '1') == '1'
+progress_hub = ProgressHub(int(os.environ.get('EVENT_QUEUE_SIZE', 64)))
+
+# Optional write-behind for global toggles: off unless WRITE_BEHIND_MS is set; the
+# buffer is flushed every WRITE_BEHIND_MS or once WRITE_BEHIND_MAX_OPS topics are pending.
+# The buffer lives in one process and acknowledges toggles from that process's view of
+# the topics, so it needs a single worker; connect() refuses WEB_CONCURRENCY above 1
+WRITE_BEHIND_MS = int(os.environ.get('WRITE_BEHIND_MS', 0))
+WRITE_BEHIND_MAX_OPS = int(os.environ.get('WRITE_BEHIND_MAX_OPS', 500))
+write_buffer: Optional[WriteBehindBuffer] = None
+write_behind_task: Optional[asyncio.Task] = None
+
+# Revisions are stamped from the database clock inside each write, so one can commit after
+# a later-stamped one; GET /api/sync deltas re-send this much history before the cursor
+SYNC_OVERLAP_MS = int(os.environ.get('SYNC_OVERLAP_MS', 5000))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect()
+    try:
+        await warm_up()
+        yield
+    finally:
+        await shutdown_db_client()
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -39,6 +121,30 @@ class Subject(BaseModel):
 class TopicUpdate(BaseModel):
     completed: bool
 
+class TopicChange(BaseModel):
+    subject: str
+    topic_id: str
+    completed: bool
+
+class BulkTopicUpdate(BaseModel):
+    updates: List[TopicChange] = Field(..., min_length=1, max_length=1000)
+    ordered: bool = False
+
+class OfflineChange(TopicChange):
+    # Revision the client last saw for this topic; None means last writer wins
+    base_rev: Optional[int] = None
+
+class OfflineSync(BaseModel):
+    user_id: Optional[str] = None
+    changes: List[OfflineChange] = Field(..., max_length=1000)
+
+class PlanRequest(BaseModel):
+    exam_date: date
+    # Students to plan for: these users, else the members of class_id, else every known student
+    user_ids: Optional[List[str]] = Field(None, min_length=1, max_length=100000)
+    class_id: Optional[str] = None
+    start_date: Optional[date] = None
+
 # Initialize curriculum data
 CURRICULUM_DATA = {
     "Türkçe": [
@@ -104,88 +210,1283 @@ CURRICULUM_DATA = {
     ]
 }
 
+# Engine behind subject summaries, topic listing and toggling: mongo, memory or sqlite.
+# Per-user progress, classes, bulk updates, sync and export need the mongo engine.
+storage: Optional[Storage] = None
+
+def mongo_client_options() -> dict:
+    """Pool, timeout and read preference settings of the Motor client"""
+    return {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        "socketTimeoutMS": int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+        # Secondaries can lag behind a toggle the same user just made; only relax this knowingly
+        "readPreference": os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+    }
+
+def connect():
+    """Create the Mongo client, toggle timeline and storage engine from the environment"""
+    global client, db, timeline, storage
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo')
+    if os.environ.get('MONGO_URL'):
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[MongoCommandMetrics(metrics)],
+                                    **mongo_client_options())
+        db = client[os.environ['DB_NAME']]
+        timeline = Timeline(db, TIMELINE_TZ)
+    elif backend == 'mongo':
+        raise RuntimeError("MONGO_URL must be set when STORAGE_BACKEND=mongo")
+    if WRITE_BEHIND_MS > 0 and int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+        raise RuntimeError("WRITE_BEHIND_MS requires a single worker; unset it or WEB_CONCURRENCY")
+    if PROGRESS_EVENTS and int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+        raise RuntimeError("Live progress events need a single worker; set PROGRESS_EVENTS=0 or unset WEB_CONCURRENCY")
+    storage = create_storage(
+        backend,
+        db=db,
+        subject_names=list(CURRICULUM_DATA.keys()),
+        sqlite_path=os.environ.get('SQLITE_PATH', str(ROOT_DIR / 'curriculum.db'))
+    )
+
+# Prefix index over subject names and topic titles, served at /api/search
+search_index = SearchIndex(CURRICULUM_DATA)
+
+def require_mongo():
+    """Dependency for endpoints only the mongo storage engine supports"""
+    if not isinstance(storage, MotorStorage):
+        raise HTTPException(status_code=501, detail="This endpoint requires STORAGE_BACKEND=mongo")
+
 @api_router.get("/")
 async def root():
     return {"message": "Müfredat To-Do List API"}
 
+# Per-user progress is one packed bitset per subject: bit i is the topic whose idx is i
+MAX_TOPICS_PER_SUBJECT = 63
+
+# subject name -> {topic id: idx}, loaded at startup
+topic_index: Dict[str, Dict[str, int]] = {}
+
+def _curriculum_hash(name: str) -> str:
+    """Content hash of one subject's topic titles in CURRICULUM_DATA"""
+    return hashlib.sha256(json.dumps(CURRICULUM_DATA[name], ensure_ascii=False).encode()).hexdigest()
+
+def _new_subject_doc(name: str) -> dict:
+    """Build a fresh subject document from the curriculum"""
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "content_hash": _curriculum_hash(name),
+        "next_idx": len(CURRICULUM_DATA[name]),
+        "topics": [{"id": str(uuid.uuid4()), "title": topic, "completed": False, "idx": idx}
+                   for idx, topic in enumerate(CURRICULUM_DATA[name])]
+    }
+
+class CurriculumTooLarge(RuntimeError):
+    """A subject needs more progress bits than a bitset holds"""
+
+def _migrate_topics(name: str, topics: List[dict], next_idx: Optional[int], reusable: List[int] = ()) -> tuple:
+    """Diff stored topics against the curriculum by title, keeping ids, state and indexes.
+
+    Returns the new topic list and the next never-used idx. New topics take never-used
+    indexes first and then `reusable` ones, which no stored topic holds and no progress
+    bitset has set; raises CurriculumTooLarge when both run out.
+    """
+    # Subjects stored before per-user progress have no idx yet; number them by position
+    topics = [dict(topic, idx=topic.get("idx", position)) for position, topic in enumerate(topics)]
+    if next_idx is None:
+        next_idx = max((topic["idx"] for topic in topics), default=-1) + 1
+    reusable = sorted(reusable)
+
+    by_title = {}
+    for topic in topics:
+        by_title.setdefault(topic["title"], []).append(topic)
+
+    migrated = []
+    for title in CURRICULUM_DATA[name]:
+        if by_title.get(title):
+            migrated.append(by_title[title].pop(0))
+            continue
+        if next_idx < MAX_TOPICS_PER_SUBJECT:
+            idx = next_idx
+            next_idx += 1
+        elif reusable:
+            idx = reusable.pop(0)
+        else:
+            raise CurriculumTooLarge(f"{name} has no free progress bit left for {title!r}")
+        migrated.append({"id": str(uuid.uuid4()), "title": title, "completed": False, "idx": idx})
+    return migrated, next_idx
+
+async def _reusable_indexes(name: str, topics: List[dict], next_idx: Optional[int]) -> List[int]:
+    """Indexes below next_idx that no stored topic holds and no progress bitset has set"""
+    held = {topic.get("idx", position) for position, topic in enumerate(topics)}
+    if next_idx is None:
+        next_idx = max(held, default=-1) + 1
+    free = []
+    for idx in range(min(next_idx, MAX_TOPICS_PER_SUBJECT)):
+        if idx not in held and not await db.progress.find_one({"subject": name, "bits": {"$bitsAnySet": [idx]}},
+                                                              {"_id": 1}):
+            free.append(idx)
+    return free
+
+async def _retire_indexes(name: str, removed: set, reused: set):
+    """Clear what per-user data still refers to indexes a migration removed or handed to a new topic"""
+    if removed:
+        # Once no bitset has the bit set any more, a later migration may reuse the index
+        mask = sum(1 << idx for idx in removed)
+        await db.progress.update_many({"subject": name, "bits": {"$bitsAnySet": mask}},
+                                      {"$bit": {"bits": {"and": Int64(~mask)}}})
+    retired = removed | reused
+    if retired:
+        await db.class_topic_counts.update_many({"subject": name},
+                                                {"$unset": {f"counts.{idx}": "" for idx in retired}})
+        await db.study_plans.update_many({"subject": name}, {"$unset": {f"weeks.{idx}": "" for idx in retired}})
+
+async def _merge_duplicate_subjects():
+    """Collapse subjects created twice by racing first requests, before the unique index"""
+    pipeline = [
+        {"$group": {"_id": "$name", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    async for group in db.subjects.aggregate(pipeline):
+        docs = await db.subjects.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(None)
+        keep, extras = docs[0], docs[1:]
+        completed_titles = {topic["title"] for doc in extras for topic in doc["topics"] if topic["completed"]}
+        topics = [dict(topic, completed=topic["completed"] or topic["title"] in completed_titles)
+                  for topic in keep["topics"]]
+        await db.subjects.update_one({"_id": keep["_id"]},
+                                     [{"$set": {"topics": {"$literal": topics}, "rev": next_rev()}}])
+        await db.subjects.delete_many({"_id": {"$in": [doc["_id"] for doc in extras]}})
+        logger.warning(f"Merged {len(extras)} duplicate subject document(s) for {group['_id']}")
+
+# Toggles landing between a migration's read and its compare-and-set make it start over
+MIGRATION_ATTEMPTS = 5
+
+async def _migrate_subject(name: str, stored_hash: Optional[str], content_hash: str) -> str:
+    """Apply the curriculum to one stored subject; returns migrated, unchanged or failed"""
+    for _ in range(MIGRATION_ATTEMPTS):
+        subject_doc = await db.subjects.find_one(
+            {"name": name}, {"_id": 0, "topics": 1, "next_idx": 1, "rev": 1, "content_hash": 1})
+        if subject_doc.get("content_hash") != stored_hash:
+            # Another worker migrated it meanwhile
+            return "unchanged"
+        stored_topics, stored_next = subject_doc["topics"], subject_doc.get("next_idx")
+        try:
+            try:
+                topics, next_idx = _migrate_topics(name, stored_topics, stored_next)
+            except CurriculumTooLarge:
+                topics, next_idx = _migrate_topics(name, stored_topics, stored_next,
+                                                   await _reusable_indexes(name, stored_topics, stored_next))
+        except CurriculumTooLarge as e:
+            # Keep serving the stored curriculum rather than refusing to start
+            logger.error(f"Curriculum migration of {name} failed, keeping the stored topics: {e}")
+            return "failed"
+
+        existing_ids = {topic["id"] for topic in stored_topics}
+        added = [topic for topic in topics if topic["id"] not in existing_ids]
+        added_ids = [topic["id"] for topic in added]
+        # Compare-and-set on the old hash and revision: only one worker applies the migration, and
+        # a toggle made after the read sends it round again instead of being overwritten. New topics
+        # take the write's revision so delta sync clients pick them up
+        result = await db.subjects.update_one(
+            {"name": name, "content_hash": stored_hash, "rev": subject_doc.get("rev")},
+            [
+                {"$set": {"rev": next_rev(), "content_hash": content_hash, "next_idx": next_idx}},
+                {"$set": {"topics": {"$map": {"input": {"$literal": topics}, "as": "topic", "in": {"$cond": [
+                    {"$in": ["$$topic.id", {"$literal": added_ids}]},
+                    {"$mergeObjects": ["$$topic", {"rev": "$rev"}]},
+                    "$$topic"
+                ]}}}}}
+            ]
+        )
+        if result.matched_count:
+            old_indexes = {topic.get("idx", position) for position, topic in enumerate(stored_topics)}
+            never_used = stored_next if stored_next is not None else max(old_indexes, default=-1) + 1
+            await _retire_indexes(name, old_indexes - {topic["idx"] for topic in topics},
+                                  {topic["idx"] for topic in added if topic["idx"] < never_used})
+            return "migrated"
+    logger.error(f"Curriculum migration of {name} kept losing to concurrent toggles; will retry on next start")
+    return "failed"
+
+async def seed_curriculum() -> Dict[str, List[str]]:
+    """Create missing subjects and migrate ones whose curriculum changed"""
+    report = {"created": [], "migrated": [], "unchanged": [], "failed": []}
+    stored = {doc["name"]: doc.get("content_hash") async for doc in db.subjects.find(
+        {"name": {"$in": list(CURRICULUM_DATA.keys())}}, {"_id": 0, "name": 1, "content_hash": 1})}
+
+    for name in CURRICULUM_DATA.keys():
+        content_hash = _curriculum_hash(name)
+        if name not in stored:
+            # $setOnInsert keeps concurrent workers from overwriting each other
+            await db.subjects.update_one(
+                {"name": name},
+                {"$setOnInsert": _new_subject_doc(name)},
+                upsert=True
+            )
+            report["created"].append(name)
+            continue
+        if stored[name] == content_hash:
+            report["unchanged"].append(name)
+            continue
+
+        status = await _migrate_subject(name, stored[name], content_hash)
+        report[status].append(name)
+
+    return report
+
+async def load_topic_index():
+    """Cache the topic id -> bit index mapping used by per-user progress"""
+    index = {}
+    async for doc in db.subjects.find({}, {"_id": 0, "name": 1, "topics.id": 1, "topics.idx": 1}):
+        index[doc["name"]] = {topic["id"]: topic["idx"] for topic in doc["topics"]}
+        if index[doc["name"]] and max(index[doc["name"]].values()) >= MAX_TOPICS_PER_SUBJECT:
+            raise RuntimeError(f"Subject {doc['name']} has more topics than a progress bitset can hold")
+    topic_index.clear()
+    topic_index.update(index)
+
+async def prepare_database():
+    """Indexes, curriculum seeding and in-memory lookups needed before serving requests"""
+    if not isinstance(storage, MotorStorage):
+        await storage.prepare(CURRICULUM_DATA)
+        return
+    await _merge_duplicate_subjects()
+    await db.subjects.create_index("name", unique=True)
+    await db.subjects.create_index("topics.id", unique=True)
+    await db.progress.create_index([("user_id", 1), ("subject", 1)], unique=True)
+    await db.progress.create_index("class_id")
+    await db.class_members.create_index("user_id", unique=True)
+    await db.classes.create_index("class_id", unique=True)
+    await db.class_topic_counts.create_index([("class_id", 1), ("subject", 1)], unique=True)
+    await timeline.prepare()
+    await db.study_plans.create_index([("user_id", 1), ("subject", 1)], unique=True)
+    report = await seed_curriculum()
+    logger.info(f"Curriculum seeding: {report}")
+    await load_topic_index()
+
+def _count_completed(subject_name: str, bits: int) -> int:
+    """Completed topics in a progress bitset, ignoring bits of topics no longer in the subject"""
+    valid = 0
+    for idx in topic_index.get(subject_name, {}).values():
+        valid |= 1 << idx
+    return bin(bits & valid).count("1")
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def _revalidating() -> bool:
+    return CACHE_REVALIDATE_MS > 0 and storage.shared
+
+async def _revalidate_cache():
+    """Drop cached subjects that another process wrote to since they were cached"""
+    if _revalidating():
+        for name, version in (await storage.subject_versions()).items():
+            subject_cache.observe(name, version)
+
+async def _revalidate_periodically():
+    """Background loop running _revalidate_cache every CACHE_REVALIDATE_MS"""
+    while True:
+        await asyncio.sleep(CACHE_REVALIDATE_MS / 1000)
+        try:
+            await _revalidate_cache()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Cache revalidation failed")
+
+def _observe_write(subject_name: str, previous: Optional[int], revision: int):
+    """Record the version this process's write stored, so revalidation keeps the cache it updated"""
+    if _revalidating():
+        subject_cache.observe_write(subject_name, previous, revision)
+
+async def _subject_summaries() -> Dict[str, dict]:
+    """Summary docs for every subject, from the cache when all of them are present"""
+    summaries = {name: subject_cache.get_summary(name) for name in CURRICULUM_DATA.keys()}
+    if any(summary is None for summary in summaries.values()):
+        revisions = {name: subject_cache.revision(name) for name in CURRICULUM_DATA.keys()}
+        summaries = {doc["name"]: doc for doc in await storage.subject_summaries()}
+        for name, doc in summaries.items():
+            if write_buffer is not None and write_buffer.subject_changes(name):
+                # Count from the topic list, which already shows the buffered states
+                completed = sum(1 for topic in await _subject_topics(name) if topic["completed"])
+                summaries[name] = doc = dict(doc, completed_topics=completed)
+            subject_cache.set_summary(name, revisions[name], doc)
+    return summaries
+
+async def _subject_topics(subject_name: str) -> List[dict]:
+    """Topic dicts of a subject, from the cache when present"""
+    topics = subject_cache.get_topics(subject_name)
+    if topics is None:
+        revision = subject_cache.revision(subject_name)
+        try:
+            topics = await storage.list_topics(subject_name)
+        except SubjectNotFound:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        if write_buffer is not None:
+            changes = write_buffer.subject_changes(subject_name)
+            if changes:
+                topics = [dict(topic, completed=changes[topic["id"]]) if topic["id"] in changes else topic
+                          for topic in topics]
+        subject_cache.set_topics(subject_name, revision, topics)
+    return topics
+
+def _encode_topics(topics: List[dict]) -> bytes:
+    """Same bytes FastAPI renders for response_model=List[Topic], without building the models"""
+    payload = [{
+        "id": topic["id"],
+        "title": topic["title"],
+        "completed": topic.get("completed", False),
+        "week": topic.get("week")
+    } for topic in topics]
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+async def _encoded_topics(subject_name: str) -> bytes:
+    body = subject_cache.get_encoded(subject_name)
+    if body is None:
+        revision = subject_cache.revision(subject_name)
+        body = _encode_topics(await _subject_topics(subject_name))
+        subject_cache.set_encoded(subject_name, revision, body)
+    return body
+
+async def _user_bits(user_id: str) -> Dict[str, int]:
+    """Progress bitsets of one user, keyed by subject name"""
+    cursor = db.progress.find({"user_id": user_id}, {"_id": 0, "subject": 1, "bits": 1})
+    return {doc["subject"]: doc["bits"] async for doc in cursor}
+
 @api_router.get("/subjects", response_model=List[dict])
-async def get_subjects():
+async def get_subjects(request: Request, response: Response, user_id: Optional[str] = None):
     """Get all subjects with topic count and completion stats"""
+    etag = subject_cache.summary_etag()
+    if user_id is None and _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if user_id is not None:
+        require_mongo()
+    summaries = await _subject_summaries()
+    user_bits = await _user_bits(user_id) if user_id is not None else None
+
     subjects = []
     for name in CURRICULUM_DATA.keys():
-        # Get or create subject in database
-        subject_doc = await db.subjects.find_one({"name": name})
-        if not subject_doc:
-            # Initialize subject with topics
-            topics_data = [{"id": str(uuid.uuid4()), "title": topic, "completed": False} 
-                          for topic in CURRICULUM_DATA[name]]
-            subject_doc = {
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "topics": topics_data
-            }
-            await db.subjects.insert_one(subject_doc)
-        
-        # Calculate stats
-        total_topics = len(subject_doc["topics"])
-        completed_topics = sum(1 for topic in subject_doc["topics"] if topic["completed"])
+        doc = summaries.get(name)
+        if not doc:
+            continue
+
+        total_topics = doc["total_topics"]
+        if user_bits is None:
+            completed_topics = doc["completed_topics"]
+        else:
+            completed_topics = _count_completed(name, user_bits.get(name, 0))
         completion_rate = (completed_topics / total_topics * 100) if total_topics > 0 else 0
-        
+
         subjects.append({
-            "id": subject_doc["id"],
-            "name": subject_doc["name"], 
+            "id": doc["id"],
+            "name": doc["name"],
             "total_topics": total_topics,
             "completed_topics": completed_topics,
             "completion_rate": round(completion_rate, 1)
         })
-    
+
+    if user_id is None:
+        response.headers["ETag"] = etag
     return subjects
 
+# Topic list filters: status maps to the completed value to match
+TOPIC_STATUSES = {"all": None, "completed": True, "pending": False}
+MAX_TOPIC_PAGE = 500
+
+async def _filtered_topics(subject_name: str, completed: Optional[bool], week: Optional[str],
+                           cursor: Optional[str], limit: Optional[int]) -> List[dict]:
+    """Filtered page of a subject's topics: from the cached list when present, else queried in storage.
+
+    The list is missing after revalidation or eviction dropped it; the page is then filtered
+    by the engine and the whole list is left for an unfiltered read to bring back.
+    """
+    topics = subject_cache.get_topics(subject_name)
+    if topics is None and write_buffer is not None and write_buffer.subject_changes(subject_name):
+        # Storage does not know the buffered states yet, so filter the overlaid list instead
+        topics = await _subject_topics(subject_name)
+    try:
+        if topics is not None:
+            return select_topics(topics, completed, week, cursor, limit)
+        return await storage.query_topics(subject_name, completed, week, cursor, limit)
+    except SubjectNotFound:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    except TopicNotFound:
+        raise HTTPException(status_code=400, detail="Unknown cursor")
+
+def _topics_response(topics: List[dict], response: Response, headers: Dict[str, str]):
+    if FAST_TOPICS:
+        return Response(_encode_topics(topics), media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return [Topic(**topic) for topic in topics]
+
 @api_router.get("/subjects/{subject_name}/topics", response_model=List[Topic])
-async def get_topics(subject_name: str):
-    """Get all topics for a specific subject"""
-    subject_doc = await db.subjects.find_one({"name": subject_name})
-    if not subject_doc:
+async def get_topics(subject_name: str, request: Request, response: Response, user_id: Optional[str] = None,
+                     status: str = "all", week: Optional[str] = None, limit: Optional[int] = None,
+                     cursor: Optional[str] = None):
+    """Get the topics of a subject, optionally filtered by status/week and paged with limit/cursor"""
+    if status not in TOPIC_STATUSES:
+        raise HTTPException(status_code=400, detail="status must be all, completed or pending")
+    if limit is not None and not 1 <= limit <= MAX_TOPIC_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_TOPIC_PAGE}")
+    completed = TOPIC_STATUSES[status]
+    filtered = completed is not None or week is not None or limit is not None or cursor is not None
+    # One extra topic tells whether another page follows
+    fetch = limit + 1 if limit is not None else None
+    headers = {}
+
+    if user_id is not None:
+        require_mongo()
+        topics = await _subject_topics(subject_name)
+        progress = await db.progress.find_one({"user_id": user_id, "subject": subject_name}, {"_id": 0, "bits": 1})
+        bits = progress["bits"] if progress else 0
+        plan = await db.study_plans.find_one({"user_id": user_id, "subject": subject_name}, {"_id": 0, "weeks": 1})
+        weeks = plan["weeks"] if plan else {}
+        # Completion and weeks are per user here, so the subject document cannot filter them
+        topics = [dict(topic, completed=bool(bits >> topic["idx"] & 1), week=weeks.get(str(topic["idx"])))
+                  for topic in topics]
+        try:
+            topics = select_topics(topics, completed, week, cursor, fetch)
+        except TopicNotFound:
+            raise HTTPException(status_code=400, detail="Unknown cursor")
+    else:
+        etag = subject_cache.etag(subject_name, request.url.query if filtered else "")
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        headers["ETag"] = etag
+
+        if not filtered:
+            if FAST_TOPICS:
+                return Response(await _encoded_topics(subject_name), media_type="application/json", headers=headers)
+            topics = await _subject_topics(subject_name)
+        else:
+            topics = await _filtered_topics(subject_name, completed, week, cursor, fetch)
+
+    if limit is not None and len(topics) > limit:
+        topics = topics[:limit]
+        headers["X-Next-Cursor"] = topics[-1]["id"]
+    return _topics_response(topics, response, headers)
+
+MAX_SEARCH_RESULTS = 100
+
+@api_router.get("/search")
+async def search(q: str = "", limit: int = 20):
+    """Search subject names and topic titles, returning ranked hits with completion state"""
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+    hits = search_index.search(q, limit)
+    summaries = await _subject_summaries() if any(hit["type"] == "subject" for hit in hits) else {}
+    topics_by_title = {}
+    results = []
+    for hit in hits:
+        if hit["type"] == "subject":
+            doc = summaries.get(hit["subject"])
+            if doc is None:
+                continue
+            results.append(dict(hit, id=doc["id"], total_topics=doc["total_topics"],
+                                completed_topics=doc["completed_topics"]))
+            continue
+        if hit["subject"] not in topics_by_title:
+            topics = await _subject_topics(hit["subject"])
+            topics_by_title[hit["subject"]] = {topic["title"]: topic for topic in topics}
+        topic = topics_by_title[hit["subject"]].get(hit["title"])
+        if topic is not None:
+            results.append(dict(hit, id=topic["id"], completed=topic["completed"]))
+    return {"query": q, "hits": results}
+
+def _publish_topic_change(subject_name: str, topic_id: str, completed: bool, revision: int,
+                          user_id: Optional[str] = None):
+    event = {
+        "type": "topic",
+        "subject": subject_name,
+        "topic_id": topic_id,
+        "completed": completed,
+        "revision": revision
+    }
+    if user_id is not None:
+        event["user_id"] = user_id
+    progress_hub.publish(event)
+
+async def _record_topic_changes(events: List[dict]):
+    """Append effective toggles to the timeline log; only the mongo engine keeps one"""
+    if isinstance(storage, MotorStorage):
+        await timeline.record(events)
+
+async def _write_topic_changes(changes: List[dict]):
+    """Flush callback of the write-behind buffer: one write per subject, all subjects at once.
+
+    Each change only applies while the topic still has the state it was buffered from,
+    so a toggle another worker or request wrote in the meantime is not overwritten.
+    Changes that did not apply publish nothing and drop the subject from the cache.
+    """
+    failure = None
+    versions = []
+    if isinstance(storage, MotorStorage):
+        by_subject = {}
+        for change in changes:
+            by_subject.setdefault(change["subject"], {})[change["topic_id"]] = change["completed"]
+        names = list(by_subject)
+        outcomes = await asyncio.gather(*(storage.set_topics(name, by_subject[name]) for name in names),
+                                        return_exceptions=True)
+        stamped = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException):
+                # The other subjects were written, so they still publish before the flush fails
+                if not isinstance(outcome, SubjectNotFound):
+                    failure = failure or outcome
+                continue
+            revision, previous, topics = outcome
+            if revision is not None:
+                versions.append((name, previous, revision))
+            stamped.update({(name, topic_id): revision for topic_id, topic in topics.items()
+                            if revision is not None and topic.get("rev") == revision})
+        revisions = [stamped.get((change["subject"], change["topic_id"])) for change in changes]
+        applied = [revision is not None for revision in revisions]
+    else:
+        revisions, applied = [], []
+        for change in changes:
+            outcome = await storage.set_topic(change["subject"], change["topic_id"], change["completed"])
+            revisions.append(outcome["revision"])
+            applied.append(outcome["status"] == "updated")
+            if applied[-1]:
+                versions.append((change["subject"], outcome["previous"], outcome["revision"]))
+
+    events = []
+    for change, revision, written in zip(changes, revisions, applied):
+        if written:
+            # Same state as already cached; bumping the revision discards cache fills that raced the write
+            subject_cache.apply_topic_update(change["subject"], change["topic_id"], change["completed"])
+            _publish_topic_change(change["subject"], change["topic_id"], change["completed"], revision)
+            events.append(topic_event(change["subject"], change["topic_id"], change["completed"], revision))
+    for name, previous, revision in versions:
+        _observe_write(name, previous, revision)
+    await _record_topic_changes(events)
+    # Last, with no await before the buffer lets go of the batch, so no read refills the rejected states
+    for change, written in zip(changes, applied):
+        if not written:
+            subject_cache.invalidate(change["subject"])
+    if failure is not None:
+        # The buffer requeues the batch; the changes written above no longer match and are dropped then
+        raise failure
+
+if WRITE_BEHIND_MS > 0:
+    write_buffer = WriteBehindBuffer(_write_topic_changes, WRITE_BEHIND_MS / 1000, WRITE_BEHIND_MAX_OPS)
+
+async def _flush_write_buffer():
+    """Write out buffered toggles before reading or writing the stored topics directly"""
+    if write_buffer is not None:
+        await write_buffer.flush()
+
+async def _buffer_topic(subject_name: str, topic_id: str, completed: bool) -> dict:
+    """Acknowledge a toggle from the write-behind buffer; the revision is assigned when it is flushed"""
+    topic = next((topic for topic in await _subject_topics(subject_name) if topic["id"] == topic_id), None)
+    if topic is None:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    if topic["completed"] == completed:
+        return {"status": "unchanged", "revision": topic.get("rev", 0), "completed": completed}
+    write_buffer.put(subject_name, topic_id, completed, topic["completed"])
+    subject_cache.apply_topic_update(subject_name, topic_id, completed)
+    return {"status": "updated", "revision": None, "completed": completed, "pending": True}
+
+async def _set_topic(subject_name: str, topic_id: str, completed: bool, base_rev: Optional[int] = None) -> dict:
+    """Set a topic's global completion flag and stamp it with a new revision.
+
+    With base_rev the write only applies if nobody changed the topic after that revision.
+    Returns the outcome status plus the topic's resulting revision and state.
+    """
+    if write_buffer is not None:
+        if base_rev is None:
+            return await _buffer_topic(subject_name, topic_id, completed)
+        # The revision check needs the stored topic, so pending toggles go first
+        await write_buffer.flush()
+    try:
+        outcome = await storage.set_topic(subject_name, topic_id, completed, base_rev)
+    except SubjectNotFound:
         raise HTTPException(status_code=404, detail="Subject not found")
-    
-    return [Topic(**topic) for topic in subject_doc["topics"]]
+    except TopicNotFound:
+        raise HTTPException(status_code=404, detail="Topic not found")
+
+    if outcome["status"] == "updated":
+        subject_cache.apply_topic_update(subject_name, topic_id, completed)
+        _observe_write(subject_name, outcome.pop("previous"), outcome["revision"])
+        _publish_topic_change(subject_name, topic_id, completed, outcome["revision"])
+        await _record_topic_changes([topic_event(subject_name, topic_id, completed, outcome["revision"])])
+    return outcome
+
+async def _set_user_topic(user_id: str, subject_name: str, topic_id: str, completed: bool,
+                          base_rev: Optional[int] = None) -> dict:
+    """Flip one bit of a user's progress bitset with a single atomic update"""
+    topics = topic_index.get(subject_name)
+    if topics is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    idx = topics.get(topic_id)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="Topic not found")
+
+    mask = 1 << idx
+    progress_filter = {"user_id": user_id, "subject": subject_name}
+    # Only a write that flips the bit matches, so a repeated toggle leaves rev alone and stays out of delta sync
+    write_filter = dict(progress_filter, bits={"$bitsAllClear" if completed else "$bitsAllSet": [idx]})
+    if base_rev is not None:
+        write_filter["rev"] = {"$not": {"$gt": base_rev}}
+    # The filter fixes the bit's current state, so adding or taking away its value flips it exactly;
+    # a pipeline update can stamp the revision from the server clock in the same write
+    flip = {"bits": {"$add": [{"$ifNull": ["$bits", Int64(0)]}, Int64(mask if completed else -mask)]},
+            "rev": next_rev()}
+    projection = {"_id": 0, "class_id": 1, "rev": 1}
+
+    after = await db.progress.find_one_and_update(write_filter, [{"$set": flip}], projection=projection,
+                                                  return_document=ReturnDocument.AFTER)
+    if after is None and completed:
+        # Maybe the first toggle in this subject: create the doc already tagged with the student's
+        # class, so a concurrent toggle can never read it without class_id and skip the counters
+        member = await db.class_members.find_one({"user_id": user_id}, {"_id": 0, "class_id": 1})
+        member_class = member["class_id"] if member else None
+        try:
+            after = await db.progress.find_one_and_update(
+                write_filter,
+                [{"$set": dict(flip, class_id={"$ifNull": ["$class_id", member_class]})}],
+                projection=projection,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The doc exists but the bit is already set or the revision check failed
+            pass
+
+    if after is None:
+        current = await db.progress.find_one(progress_filter, {"_id": 0, "bits": 1, "rev": 1}) or {}
+        current_state = bool(current.get("bits", 0) & mask)
+        status = "unchanged" if current_state == completed else "conflict"
+        return {"status": status, "revision": current.get("rev", 0), "completed": current_state}
+
+    revision = after["rev"]
+    class_id = after.get("class_id")
+    if class_id is not None:
+        await db.class_topic_counts.update_one(
+            {"class_id": class_id, "subject": subject_name},
+            {"$inc": {f"counts.{idx}": 1 if completed else -1}},
+            upsert=True
+        )
+    _publish_topic_change(subject_name, topic_id, completed, revision, user_id)
+    await _record_topic_changes([topic_event(subject_name, topic_id, completed, revision, user_id)])
+    return {"status": "updated", "revision": revision, "completed": completed}
 
 @api_router.put("/subjects/{subject_name}/topics/{topic_id}")
-async def toggle_topic_completion(subject_name: str, topic_id: str, update_data: TopicUpdate):
+async def toggle_topic_completion(subject_name: str, topic_id: str, update_data: TopicUpdate,
+                                  user_id: Optional[str] = None):
     """Toggle topic completion status"""
-    subject_doc = await db.subjects.find_one({"name": subject_name})
-    if not subject_doc:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    
-    # Find and update the topic
-    topics = subject_doc["topics"]
-    topic_found = False
-    for topic in topics:
-        if topic["id"] == topic_id:
-            topic["completed"] = update_data.completed  
-            topic_found = True
+    if user_id is not None:
+        require_mongo()
+        outcome = await _set_user_topic(user_id, subject_name, topic_id, update_data.completed)
+    else:
+        outcome = await _set_topic(subject_name, topic_id, update_data.completed)
+
+    response = {
+        "message": "Topic updated successfully",
+        "matched_count": 1,
+        "modified_count": 1 if outcome["status"] == "updated" else 0,
+        "revision": outcome["revision"]
+    }
+    if outcome.get("pending"):
+        response["pending"] = True
+    return response
+
+def _bulk_batches(updates: List[TopicChange], items: List[int], ordered: bool) -> List[List[int]]:
+    """Split bulk items into single-subject writes that each touch a topic at most once.
+
+    Unordered items are grouped per subject; ordered ones only merge with their neighbours,
+    so a failing write never leaves a later item applied before an earlier one.
+    A topic named twice goes into a later write, keeping the last change the one that sticks.
+    """
+    batches = []
+    open_batches = {}
+    for index in items:
+        change = updates[index]
+        key = change.subject if not ordered else None
+        batch = open_batches.get(key)
+        if batch is None or (ordered and updates[batch[0]].subject != change.subject) or \
+                any(updates[other].topic_id == change.topic_id for other in batch):
+            batch = []
+            batches.append(batch)
+            open_batches[key] = batch
+        batch.append(index)
+    return batches
+
+@api_router.put("/topics/bulk", dependencies=[Depends(require_mongo)])
+async def bulk_update_topics(bulk: BulkTopicUpdate):
+    """Apply many topic completion changes with one atomic write per subject"""
+    await _flush_write_buffer()
+    subject_names = {change.subject for change in bulk.updates}
+    known_topics = {}
+    async for doc in db.subjects.find({"name": {"$in": list(subject_names)}},
+                                      {"_id": 0, "name": 1, "topics.id": 1}):
+        known_topics[doc["name"]] = {topic["id"] for topic in doc["topics"]}
+
+    results = [{"subject": change.subject, "topic_id": change.topic_id, "status": "pending"}
+               for change in bulk.updates]
+    operation_items = []
+    for index, change in enumerate(bulk.updates):
+        if change.subject not in known_topics:
+            results[index].update(status="not_found", detail="Subject not found")
+        elif change.topic_id not in known_topics[change.subject]:
+            results[index].update(status="not_found", detail="Topic not found")
+        else:
+            operation_items.append(index)
+            continue
+
+        # Ordered batches stop at the first failing item, like Mongo does
+        if bulk.ordered:
             break
-    
-    if not topic_found:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    
-    # Update in database
-    await db.subjects.update_one(
-        {"name": subject_name},
-        {"$set": {"topics": topics}}
+
+    modified_count = 0
+    events = []
+    for batch in _bulk_batches(bulk.updates, operation_items, bulk.ordered):
+        subject_name = bulk.updates[batch[0]].subject
+        try:
+            revision, previous, topics = await storage.set_topics(
+                subject_name, {bulk.updates[index].topic_id: bulk.updates[index].completed for index in batch})
+        except (SubjectNotFound, OperationFailure) as e:
+            for index in batch:
+                results[index].update(status="error", detail=str(e))
+            if bulk.ordered:
+                break
+            continue
+        for index in batch:
+            change = bulk.updates[index]
+            topic = topics.get(change.topic_id)
+            if topic is None:
+                # Removed by a migration since the lookup above
+                results[index].update(status="not_found", detail="Topic not found")
+            elif revision is None or topic.get("rev") != revision:
+                results[index].update(status="unchanged", revision=topic.get("rev", 0))
+            else:
+                modified_count += 1
+                results[index].update(status="updated", revision=revision)
+                subject_cache.apply_topic_update(change.subject, change.topic_id, change.completed)
+                _publish_topic_change(change.subject, change.topic_id, change.completed, revision)
+                events.append(topic_event(change.subject, change.topic_id, change.completed, revision))
+        if revision is not None:
+            _observe_write(subject_name, previous, revision)
+    await _record_topic_changes(events)
+    matched_count = modified_count
+
+    for item in results:
+        if item["status"] == "pending":
+            item["status"] = "skipped"
+
+    return {
+        "matched_count": matched_count,
+        "modified_count": modified_count,
+        "results": results
+    }
+
+@api_router.get("/sync", dependencies=[Depends(require_mongo)])
+async def sync_changes(since: int = 0, user_id: Optional[str] = None):
+    """Topics changed after a revision; since=0 returns a full snapshot.
+
+    Revisions come from the server clock at write time, so a write can commit just after
+    a later-stamped one; deltas reach SYNC_OVERLAP_MS back from since to pick those up,
+    and clients may see a topic they already have again.
+    """
+    await _flush_write_buffer()
+    revision = await storage.clock_revision()
+    threshold = max(since - SYNC_OVERLAP_MS * REVISION_SCALE, 0) if since > 0 else -1
+
+    changes = []
+    if user_id is not None:
+        progress_query = {"user_id": user_id}
+        if threshold >= 0:
+            progress_query["rev"] = {"$gt": threshold}
+        progress = {doc["subject"]: doc async for doc in db.progress.find(
+            progress_query, {"_id": 0, "subject": 1, "bits": 1, "rev": 1})}
+        for name in CURRICULUM_DATA.keys():
+            doc = progress.get(name)
+            if doc is None and threshold >= 0:
+                continue
+            bits, rev = (doc.get("bits", 0), doc.get("rev", 0)) if doc else (0, 0)
+            # A bitset changes as a whole, so every topic of a changed subject is sent
+            for topic in await _subject_topics(name):
+                changes.append({
+                    "subject": name,
+                    "id": topic["id"],
+                    "title": topic["title"],
+                    "completed": bool(bits >> topic["idx"] & 1),
+                    "week": topic.get("week"),
+                    "rev": rev
+                })
+        return {"revision": revision, "topics": changes}
+
+    subject_query = {"name": {"$in": list(CURRICULUM_DATA.keys())}}
+    if threshold >= 0:
+        subject_query["rev"] = {"$gt": threshold}
+    pipeline = [
+        {"$match": subject_query},
+        {"$project": {"_id": 0, "name": 1, "topics": {"$filter": {
+            "input": "$topics", "as": "topic",
+            "cond": {"$gt": [{"$ifNull": ["$$topic.rev", 0]}, threshold]}
+        }}}}
+    ]
+    async for doc in db.subjects.aggregate(pipeline):
+        for topic in doc["topics"]:
+            changes.append({
+                "subject": doc["name"],
+                "id": topic["id"],
+                "title": topic["title"],
+                "completed": topic["completed"],
+                "week": topic.get("week"),
+                "rev": topic.get("rev", 0)
+            })
+    return {"revision": revision, "topics": changes}
+
+@api_router.post("/sync", dependencies=[Depends(require_mongo)])
+async def apply_offline_changes(sync: OfflineSync):
+    """Apply toggles queued while offline, in order, with optional revision checks"""
+    results = []
+    for change in sync.changes:
+        try:
+            if sync.user_id is not None:
+                outcome = await _set_user_topic(sync.user_id, change.subject, change.topic_id,
+                                                change.completed, change.base_rev)
+            else:
+                outcome = await _set_topic(change.subject, change.topic_id, change.completed, change.base_rev)
+        except HTTPException as e:
+            outcome = {"status": "not_found", "detail": e.detail}
+        results.append(dict(outcome, subject=change.subject, topic_id=change.topic_id))
+
+    return {"revision": await storage.clock_revision(), "results": results}
+
+def _bit_increments(bits: int, delta: int) -> Dict[str, int]:
+    """$inc document adding delta to the class counter of every set bit"""
+    return {f"counts.{idx}": delta for idx in range(MAX_TOPICS_PER_SUBJECT) if bits >> idx & 1}
+
+@api_router.put("/classes/{class_id}/students/{user_id}", dependencies=[Depends(require_mongo)])
+async def enroll_student(class_id: str, user_id: str):
+    """Put a student in a class, moving their completed topics into its rollups"""
+    previous = await db.class_members.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": {"class_id": class_id}},
+        projection={"_id": 0, "class_id": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    previous_class = previous["class_id"] if previous else None
+    if previous_class == class_id:
+        return {"message": "Student already enrolled"}
+
+    await db.classes.update_one({"class_id": class_id}, {"$inc": {"student_count": 1}}, upsert=True)
+    if previous_class is not None:
+        await db.classes.update_one({"class_id": previous_class}, {"$inc": {"student_count": -1}})
+
+    async for progress in db.progress.find({"user_id": user_id}, {"_id": 0, "subject": 1, "bits": 1}):
+        if not progress["bits"]:
+            continue
+        if previous_class is not None:
+            await db.class_topic_counts.update_one(
+                {"class_id": previous_class, "subject": progress["subject"]},
+                {"$inc": _bit_increments(progress["bits"], -1)}
+            )
+        await db.class_topic_counts.update_one(
+            {"class_id": class_id, "subject": progress["subject"]},
+            {"$inc": _bit_increments(progress["bits"], 1)},
+            upsert=True
+        )
+    await db.progress.update_many({"user_id": user_id}, {"$set": {"class_id": class_id}})
+
+    return {"message": "Student enrolled successfully"}
+
+@api_router.get("/classes/{class_id}/progress", dependencies=[Depends(require_mongo)])
+async def get_class_progress(class_id: str):
+    """Per-topic completion counts for a class, read from the incremental rollups"""
+    class_doc = await db.classes.find_one({"class_id": class_id}, {"_id": 0, "student_count": 1})
+    if not class_doc:
+        raise HTTPException(status_code=404, detail="Class not found")
+    student_count = class_doc.get("student_count", 0)
+
+    counts = {}
+    async for doc in db.class_topic_counts.find({"class_id": class_id}, {"_id": 0, "subject": 1, "counts": 1}):
+        counts[doc["subject"]] = doc.get("counts", {})
+
+    subjects = []
+    for name in CURRICULUM_DATA.keys():
+        subject_counts = counts.get(name, {})
+        topics = []
+        for topic in await _subject_topics(name):
+            completed_count = subject_counts.get(str(topic["idx"]), 0)
+            completion_rate = (completed_count / student_count * 100) if student_count > 0 else 0
+            topics.append({
+                "id": topic["id"],
+                "title": topic["title"],
+                "completed_count": completed_count,
+                "completion_rate": round(completion_rate, 1)
+            })
+        subjects.append({"name": name, "topics": topics})
+
+    return {"class_id": class_id, "student_count": student_count, "subjects": subjects}
+
+async def rebuild_class_rollups(class_id: Optional[str] = None) -> dict:
+    """Recompute class student counts and topic counters from class_members and progress"""
+    class_filter = {"class_id": class_id} if class_id is not None else {}
+
+    student_counts = {}
+    async for member in db.class_members.find(class_filter, {"_id": 0, "class_id": 1}):
+        student_counts[member["class_id"]] = student_counts.get(member["class_id"], 0) + 1
+
+    topic_counts = {}
+    progress_filter = {"class_id": class_id if class_id is not None else {"$ne": None}}
+    async for progress in db.progress.find(progress_filter, {"_id": 0, "class_id": 1, "subject": 1, "bits": 1}):
+        counts = topic_counts.setdefault((progress["class_id"], progress["subject"]), {})
+        for idx in range(MAX_TOPICS_PER_SUBJECT):
+            if progress["bits"] >> idx & 1:
+                counts[str(idx)] = counts.get(str(idx), 0) + 1
+
+    await db.classes.update_many(class_filter, {"$set": {"student_count": 0}})
+    for name, count in student_counts.items():
+        await db.classes.update_one({"class_id": name}, {"$set": {"student_count": count}}, upsert=True)
+    # Each counter doc is replaced in place: a toggle's $inc upsert landing between a
+    # delete_many and an insert_many would hit the unique index or be wiped out
+    operations = [
+        ReplaceOne({"class_id": name, "subject": subject}, {"class_id": name, "subject": subject, "counts": counts},
+                   upsert=True)
+        for (name, subject), counts in topic_counts.items()
+    ]
+    async for doc in db.class_topic_counts.find(class_filter, {"_id": 0, "class_id": 1, "subject": 1}):
+        key = (doc["class_id"], doc["subject"])
+        if key not in topic_counts:
+            operations.append(ReplaceOne({"class_id": key[0], "subject": key[1]},
+                                         {"class_id": key[0], "subject": key[1], "counts": {}}))
+    if operations:
+        await db.class_topic_counts.bulk_write(operations, ordered=False)
+
+    return {"classes": len(student_counts), "counters": len(topic_counts)}
+
+@api_router.post("/classes/rollups/rebuild", dependencies=[Depends(require_mongo)])
+async def rebuild_class_rollups_endpoint(class_id: Optional[str] = None):
+    """Reconcile the class rollups with the per-student progress"""
+    return await rebuild_class_rollups(class_id)
+
+# Buckets returned when the timeline request gives no start
+TIMELINE_DEFAULT_SPAN = {"day": timedelta(days=29), "week": timedelta(weeks=11)}
+
+@api_router.get("/timeline", dependencies=[Depends(require_mongo)])
+async def get_timeline(period: str = "week", subject: Optional[str] = None, user_id: Optional[str] = None,
+                       start: Optional[str] = None, end: Optional[str] = None):
+    """Completions and un-completions per day or ISO week, read from the pre-aggregated buckets"""
+    if period not in PERIOD_FORMATS:
+        raise HTTPException(status_code=400, detail="period must be day or week")
+    if subject is not None and subject not in CURRICULUM_DATA:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    now = datetime.now(timezone.utc)
+    start = start or timeline.bucket(now - TIMELINE_DEFAULT_SPAN[period], period)
+    end = end or timeline.bucket(now, period)
+
+    # Buckets without any toggle are omitted
+    buckets = await timeline.read(period, start, end, user_id=user_id, subject=subject)
+    return {
+        "period": period,
+        "timezone": str(TIMELINE_TZ),
+        "subject": subject,
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "buckets": buckets
+    }
+
+@api_router.post("/timeline/rollup", dependencies=[Depends(require_mongo)])
+async def rollup_timeline():
+    """Fold pending toggle events into the buckets now instead of waiting for the background task"""
+    return {"events": await timeline.rollup()}
+
+@api_router.post("/timeline/rebuild", dependencies=[Depends(require_mongo)])
+async def rebuild_timeline():
+    """Recompute every timeline bucket from the full toggle log"""
+    try:
+        return await timeline.rebuild()
+    except RebuildInProgress as error:
+        raise HTTPException(status_code=409, detail=str(error))
+
+PLAN_WRITE_BATCH = 1000
+
+async def _plan_students(plan: PlanRequest) -> List[str]:
+    if plan.user_ids is not None:
+        return list(dict.fromkeys(plan.user_ids))
+    if plan.class_id is not None:
+        students = [member["user_id"] async for member in db.class_members.find(
+            {"class_id": plan.class_id}, {"_id": 0, "user_id": 1})]
+        if not students:
+            raise HTTPException(status_code=404, detail="Class not found")
+        return students
+    return sorted(set(await db.class_members.distinct("user_id")) | set(await db.progress.distinct("user_id")))
+
+@api_router.post("/plans", dependencies=[Depends(require_mongo)])
+async def generate_study_plans(plan: PlanRequest):
+    """Spread each student's remaining topics over the weeks until the exam, for many students at once"""
+    start = plan.start_date or datetime.now(TIMELINE_TZ).date()
+    if plan.exam_date < start:
+        raise HTTPException(status_code=400, detail="exam_date must not be before start_date")
+    weeks = week_labels(start, plan.exam_date)
+    students = await _plan_students(plan)
+    rows = {user_id: row for row, user_id in enumerate(students)}
+
+    subjects = {name: list(topic_index[name].values()) for name in CURRICULUM_DATA.keys() if name in topic_index}
+    bits = {name: np.zeros(len(students), dtype=np.int64) for name in subjects}
+    async for doc in db.progress.find({"user_id": {"$in": students}, "subject": {"$in": list(subjects)}},
+                                      {"_id": 0, "user_id": 1, "subject": 1, "bits": 1}):
+        bits[doc["subject"]][rows[doc["user_id"]]] = doc["bits"]
+
+    planner = StudyPlanner(subjects)
+    assignment = planner.assign(planner.completion_matrix(bits), len(weeks))
+    # Index -1 (completed topic) picks the trailing None
+    labels = np.array(weeks + [None], dtype=object)[assignment]
+
+    generated_at = datetime.now(timezone.utc)
+    operations = []
+    for name, column in zip(planner.subjects, planner.offsets[:-1]):
+        keys = [str(idx) for idx in planner.subjects[name]]
+        block = labels[:, column:column + len(keys)].tolist()
+        for user_id, row in zip(students, block):
+            operations.append(UpdateOne(
+                {"user_id": user_id, "subject": name},
+                {"$set": {
+                    "weeks": {key: label for key, label in zip(keys, row) if label is not None},
+                    "exam_date": plan.exam_date.isoformat(),
+                    "generated_at": generated_at
+                }},
+                upsert=True
+            ))
+    for offset in range(0, len(operations), PLAN_WRITE_BATCH):
+        await db.study_plans.bulk_write(operations[offset:offset + PLAN_WRITE_BATCH], ordered=False)
+
+    return {
+        "students": len(students),
+        "weeks": weeks,
+        "planned_topics": int((assignment >= 0).sum())
+    }
+
+@api_router.get("/plans/{user_id}", dependencies=[Depends(require_mongo)])
+async def get_study_plan(user_id: str):
+    """A student's plan grouped by week, with current completion state"""
+    plans = {doc["subject"]: doc async for doc in db.study_plans.find(
+        {"user_id": user_id}, {"_id": 0, "subject": 1, "weeks": 1, "exam_date": 1})}
+    if not plans:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    user_bits = await _user_bits(user_id)
+
+    by_week = {}
+    for name in CURRICULUM_DATA.keys():
+        plan = plans.get(name)
+        if plan is None:
+            continue
+        bits = user_bits.get(name, 0)
+        for topic in await _subject_topics(name):
+            label = plan["weeks"].get(str(topic["idx"]))
+            if label is None:
+                continue
+            by_week.setdefault(label, []).append({
+                "subject": name,
+                "id": topic["id"],
+                "title": topic["title"],
+                "completed": bool(bits >> topic["idx"] & 1)
+            })
+
+    return {
+        "user_id": user_id,
+        "exam_date": next(iter(plans.values())).get("exam_date"),
+        "weeks": [{"week": label, "topics": by_week[label]} for label in sorted(by_week)]
+    }
+
+EXPORT_FIELDS = ("user_id", "class_id", "subject", "topic_id", "title", "completed")
+_export_json = json.JSONEncoder(ensure_ascii=False)
+
+async def iter_progress_export(docs: AsyncIterator[dict], fields: List[str], export_format: str,
+                               topics_by_subject: Dict[str, List[dict]]) -> AsyncIterator[bytes]:
+    """Encode progress documents as one row per topic, one chunk per document"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if export_format == "csv":
+        writer.writerow(fields)
+
+    async for doc in docs:
+        bits = doc.get("bits", 0)
+        for topic in topics_by_subject.get(doc["subject"], []):
+            row = {
+                "user_id": doc.get("user_id"),
+                "class_id": doc.get("class_id"),
+                "subject": doc["subject"],
+                "topic_id": topic["id"],
+                "title": topic["title"],
+                "completed": bool(bits >> topic["idx"] & 1)
+            }
+            if export_format == "csv":
+                writer.writerow([row[field] for field in fields])
+            else:
+                buffer.write(_export_json.encode({field: row[field] for field in fields}))
+                buffer.write("\n")
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+@api_router.get("/export/progress", dependencies=[Depends(require_mongo)])
+async def export_progress(format: str = "ndjson", fields: Optional[str] = None, batch_size: int = 500,
+                          class_id: Optional[str] = None, subject: Optional[str] = None):
+    """Stream per-student topic completion as NDJSON or CSV straight from a cursor"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    selected = fields.split(",") if fields else list(EXPORT_FIELDS)
+    unknown = [field for field in selected if field not in EXPORT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown export fields: {', '.join(unknown)}")
+    if not 1 <= batch_size <= 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
+    query = {}
+    if class_id is not None:
+        query["class_id"] = class_id
+    if subject is not None:
+        query["subject"] = subject
+    projection = {"_id": 0, "subject": 1, "bits": 1}
+    projection.update({field: 1 for field in ("user_id", "class_id") if field in selected})
+
+    subject_names = [subject] if subject is not None else list(CURRICULUM_DATA.keys())
+    topics_by_subject = {name: await _subject_topics(name) for name in subject_names}
+
+    cursor = db.progress.find(query, projection).batch_size(batch_size)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_progress_export(cursor, selected, format, topics_by_subject),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="progress.{format}"'}
     )
-    
-    return {"message": "Topic updated successfully"}
+
+@api_router.websocket("/ws/progress")
+async def progress_socket(websocket: WebSocket, subject: Optional[str] = None):
+    """Push topic completion deltas to a WebSocket client"""
+    if not PROGRESS_EVENTS:
+        # Policy violation: live events are off on this deployment
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscription = progress_hub.subscribe(subject)
+    # Listen to the client as well, so one that leaves while no event is due is noticed at once
+    receiving = asyncio.ensure_future(websocket.receive())
+    waiting = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            if receiving in done:
+                if receiving.result()["type"] == "websocket.disconnect":
+                    break
+                # Nothing is expected from clients; whatever they send is ignored
+                receiving = asyncio.ensure_future(websocket.receive())
+            if waiting in done:
+                event = waiting.result()
+                if event is None:
+                    # Dropped for falling behind; the client should refetch and reconnect
+                    await websocket.close(code=1013)
+                    break
+                await websocket.send_json(event)
+                waiting = asyncio.ensure_future(subscription.get())
+    except WebSocketDisconnect:
+        pass
+    except Exception as error:
+        # Starlette refuses a send once the close went out: the client left, nothing failed
+        if not isinstance(error, RuntimeError) or websocket.application_state != WebSocketState.DISCONNECTED:
+            logger.exception("Progress WebSocket failed")
+            if websocket.application_state == WebSocketState.CONNECTED:
+                await websocket.close(code=1011)
+    finally:
+        receiving.cancel()
+        waiting.cancel()
+        progress_hub.unsubscribe(subscription)
+
+SSE_HEARTBEAT_SECONDS = 15
+
+@api_router.get("/events")
+async def progress_events(request: Request, subject: Optional[str] = None):
+    """Push topic completion deltas as Server-Sent Events"""
+    if not PROGRESS_EVENTS:
+        raise HTTPException(status_code=501, detail="Live progress events are off (PROGRESS_EVENTS=0)")
+
+    async def stream():
+        subscription = progress_hub.subscribe(subject)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    break
+                yield f"event: topic\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            progress_hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@api_router.get("/events/stats")
+async def get_event_stats():
+    """Subscriber and fan-out counters for the live progress hub"""
+    return progress_hub.stats()
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of request and Mongo command metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/health/live")
+async def liveness():
+    """The process is up and its event loop answers"""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Warm-up is done and the database answers; load balancers route traffic only while this is 200"""
+    if not ready:
+        raise HTTPException(status_code=503, detail="Starting up or shutting down")
+    status = {"status": "ready", "storage": storage.name}
+    if isinstance(storage, MotorStorage):
+        try:
+            await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"MongoDB unavailable: {e.__class__.__name__}")
+        status["mongo"] = "ok"
+    return status
+
+@api_router.get("/write-buffer/stats")
+async def get_write_buffer_stats():
+    """Coalescing counters of the write-behind buffer"""
+    if write_buffer is None:
+        return {"enabled": False}
+    return dict(write_buffer.stats(), enabled=True)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the subject cache"""
+    return subject_cache.stats()
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Configure logging
@@ -195,6 +1496,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+async def warm_up():
+    """Indexes, seeding and cache fills, then background tasks; done before the app takes traffic"""
+    global rollup_task, write_behind_task, revalidate_task, ready
+    await prepare_database()
+    # Record the stored versions first, so the first request does not throw the warm cache away
+    await _revalidate_cache()
+    await _subject_summaries()
+    for name in CURRICULUM_DATA.keys():
+        if FAST_TOPICS:
+            await _encoded_topics(name)
+        else:
+            await _subject_topics(name)
+    if isinstance(storage, MotorStorage):
+        rollup_task = asyncio.create_task(timeline.run(ROLLUP_INTERVAL))
+    if write_buffer is not None:
+        write_behind_task = asyncio.create_task(write_buffer.run())
+    if _revalidating():
+        revalidate_task = asyncio.create_task(_revalidate_periodically())
+    ready = True
+    logger.info(f"Ready with {storage.name} storage")
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    global ready
+    ready = False
+    if revalidate_task is not None:
+        revalidate_task.cancel()
+        try:
+            await revalidate_task
+        except asyncio.CancelledError:
+            pass
+    if write_behind_task is not None:
+        write_behind_task.cancel()
+        try:
+            await write_behind_task
+        except asyncio.CancelledError:
+            pass
+    # Acknowledged toggles must reach the database before the client goes away
+    await _flush_write_buffer()
+    if rollup_task is not None:
+        rollup_task.cancel()
+        try:
+            await rollup_task
+        except asyncio.CancelledError:
+            pass
+        # Leave no logged toggle out of the buckets
+        await timeline.rollup()
+    if storage is not None:
+        await storage.close()
+    if client is not None:
+        client.close()
\ No newline at end of file
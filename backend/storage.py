@@ -0,0 +1,490 @@
+import asyncio
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+
+class SubjectNotFound(LookupError):
+    pass
+
+
+class TopicNotFound(LookupError):
+    pass
+
+
+class Storage:
+    """Subject summaries, topic listing and topic toggling, independent of the database.
+
+    Topics are plain dicts with id, title, completed, week, idx and rev. set_topic
+    returns {"status": "updated" | "unchanged" | "conflict", "revision", "completed"}:
+    with base_rev the write only applies if the topic was not changed after it.
+    An "updated" outcome also carries "previous", the subject version the write
+    replaced, while "revision" is the subject version it left.
+    """
+
+    name = "abstract"
+    # Whether other processes can write to the same data, so per-process caches must revalidate
+    shared = True
+
+    async def prepare(self, curriculum: Dict[str, List[str]]):
+        """Create whatever subjects of the curriculum are missing"""
+        raise NotImplementedError
+
+    async def subject_summaries(self) -> List[dict]:
+        """id, name, total_topics and completed_topics of every subject"""
+        raise NotImplementedError
+
+    async def list_topics(self, subject_name: str) -> List[dict]:
+        raise NotImplementedError
+
+    async def subject_versions(self) -> Dict[str, int]:
+        """Per subject, a number that changes with every committed write to its topics"""
+        raise NotImplementedError
+
+    async def query_topics(self, subject_name: str, completed: Optional[bool] = None, week: Optional[str] = None,
+                           after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Topics matching completed/week in list order, starting after the topic id `after`"""
+        return select_topics(await self.list_topics(subject_name), completed, week, after, limit)
+
+    async def set_topic(self, subject_name: str, topic_id: str, completed: bool,
+                        base_rev: Optional[int] = None) -> dict:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+def _new_topics(titles: List[str]) -> List[dict]:
+    return [{"id": str(uuid.uuid4()), "title": title, "completed": False, "week": None, "idx": idx, "rev": 0}
+            for idx, title in enumerate(titles)]
+
+
+def select_topics(topics: List[dict], completed: Optional[bool] = None, week: Optional[str] = None,
+                  after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+    """query_topics over an in-memory topic list; raises TopicNotFound for an unknown `after`"""
+    start = 0
+    if after is not None:
+        start = next((position + 1 for position, topic in enumerate(topics) if topic["id"] == after), None)
+        if start is None:
+            raise TopicNotFound(after)
+    selected = []
+    for topic in topics[start:]:
+        if limit is not None and len(selected) >= limit:
+            break
+        if completed is not None and topic["completed"] != completed:
+            continue
+        if week is not None and topic.get("week") != week:
+            continue
+        selected.append(topic)
+    return selected
+
+
+def _outcome(topic: dict, completed: bool, base_rev: Optional[int]) -> Optional[dict]:
+    """Result for a write that must not apply, or None when it should"""
+    if topic["completed"] == completed:
+        return {"status": "unchanged", "revision": topic.get("rev", 0), "completed": completed}
+    if base_rev is not None and topic.get("rev", 0) > base_rev:
+        return {"status": "conflict", "revision": topic.get("rev", 0), "completed": topic["completed"]}
+    return None
+
+
+# Mongo revisions come from the server clock inside the write that uses them: microseconds
+# since the epoch, raised past the document's own rev so every write still moves it forward.
+# They stay below 2**53, so JavaScript clients read them exactly
+REVISION_SCALE = 1000
+
+
+def next_rev(current: str = "$rev") -> dict:
+    """Expression for the revision a pipeline update stamps on a document"""
+    return {"$max": [
+        {"$add": [{"$ifNull": [current, 0]}, 1]},
+        {"$multiply": [{"$toLong": "$$NOW"}, REVISION_SCALE]}
+    ]}
+
+
+class MotorStorage(Storage):
+    """Subjects as documents with embedded topic arrays in MongoDB"""
+
+    name = "mongo"
+
+    def __init__(self, db, subject_names: List[str]):
+        self.db = db
+        self.subject_names = subject_names
+        # Summary of every subject, computed server-side so topic arrays never leave Mongo
+        self.summary_pipeline = [
+            {"$match": {"name": {"$in": subject_names}}},
+            {"$project": {
+                "_id": 0,
+                "id": 1,
+                "name": 1,
+                "total_topics": {"$size": "$topics"},
+                "completed_topics": {"$size": {"$filter": {
+                    "input": "$topics", "as": "topic", "cond": "$$topic.completed"
+                }}}
+            }}
+        ]
+
+    async def prepare(self, curriculum: Dict[str, List[str]]):
+        # Seeding and migration of Mongo subjects is done by server.prepare_database
+        pass
+
+    async def subject_summaries(self) -> List[dict]:
+        return await self.db.subjects.aggregate(self.summary_pipeline).to_list(None)
+
+    async def list_topics(self, subject_name: str) -> List[dict]:
+        subject_doc = await self.db.subjects.find_one({"name": subject_name}, {"_id": 0, "topics": 1})
+        if not subject_doc:
+            raise SubjectNotFound(subject_name)
+        return subject_doc["topics"]
+
+    async def subject_versions(self) -> Dict[str, int]:
+        # Every write to a subject stamps a rev above the one it found
+        cursor = self.db.subjects.find({"name": {"$in": self.subject_names}}, {"_id": 0, "name": 1, "rev": 1})
+        return {doc["name"]: doc.get("rev", 0) async for doc in cursor}
+
+    async def query_topics(self, subject_name: str, completed: Optional[bool] = None, week: Optional[str] = None,
+                           after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        # Filter and page inside the aggregation so only the matching topics leave Mongo
+        topics = "$topics"
+        if after is not None:
+            start = {"$add": [{"$indexOfArray": ["$topics.id", after]}, 1]}
+            topics = {"$slice": ["$topics", start, {"$max": [{"$size": "$topics"}, 1]}]}
+        conditions = []
+        if completed is not None:
+            conditions.append({"$eq": ["$$topic.completed", completed]})
+        if week is not None:
+            conditions.append({"$eq": ["$$topic.week", week]})
+        if conditions:
+            topics = {"$filter": {"input": topics, "as": "topic", "cond": {"$and": conditions}}}
+        if limit is not None:
+            topics = {"$slice": [topics, limit]}
+
+        projection = {"_id": 0, "topics": topics}
+        if after is not None:
+            projection["cursor_found"] = {"$in": [after, "$topics.id"]}
+        docs = await self.db.subjects.aggregate([{"$match": {"name": subject_name}}, {"$project": projection}]).to_list(1)
+        if not docs:
+            raise SubjectNotFound(subject_name)
+        if after is not None and not docs[0]["cursor_found"]:
+            raise TopicNotFound(after)
+        return docs[0]["topics"]
+
+    async def clock_revision(self) -> int:
+        """The revision a write starting now would take, ignoring the per-document bump"""
+        hello = await self.db.command("hello")
+        return int(hello["localTime"].replace(tzinfo=timezone.utc).timestamp() * 1000) * REVISION_SCALE
+
+    async def set_topics(self, subject_name: str, states: Dict[str, bool],
+                         base_rev: Optional[int] = None) -> Tuple[Optional[int], Optional[int], Dict[str, dict]]:
+        """Flip several topics of a subject in one write that stamps its own revision.
+
+        A topic only changes if it has the other state (and, with base_rev, was not changed
+        after that revision). Returns the revision stamped on the topics that changed and the
+        subject rev it replaced, both None when nothing changed, and the id -> {completed, rev}
+        of every topic after the write.
+        """
+        ids, targets = list(states), list(states.values())
+        matches = []
+        for topic_id, completed in states.items():
+            match = {"id": topic_id, "completed": {"$ne": completed}}
+            if base_rev is not None:
+                match["rev"] = {"$not": {"$gt": base_rev}}
+            matches.append(match)
+        flips = [{"$ne": ["$$topic.completed", "$$target"]}]
+        if base_rev is not None:
+            flips.append({"$lte": [{"$ifNull": ["$$topic.rev", 0]}, base_rev]})
+        projection = {"_id": 0, "rev": 1, "prev_rev": 1, "topics.id": 1, "topics.completed": 1, "topics.rev": 1}
+
+        # Single document write, so concurrent toggles on one subject never overwrite each other
+        # and the revision is taken and committed together
+        doc = await self.db.subjects.find_one_and_update(
+            {"name": subject_name, "topics": {"$elemMatch": {"$or": matches}}},
+            [
+                # Both fields are computed from the document as it was before this stage
+                {"$set": {"prev_rev": {"$ifNull": ["$rev", 0]}, "rev": next_rev()}},
+                {"$set": {"topics": {"$map": {"input": "$topics", "as": "topic", "in": {"$let": {
+                    "vars": {"at": {"$indexOfArray": [{"$literal": ids}, "$$topic.id"]}},
+                    "in": {"$let": {
+                        "vars": {"target": {"$arrayElemAt": [{"$literal": targets}, "$$at"]}},
+                        "in": {"$cond": [
+                            {"$and": [{"$gte": ["$$at", 0]}] + flips},
+                            {"$mergeObjects": ["$$topic", {"completed": "$$target", "rev": "$rev"}]},
+                            "$$topic"
+                        ]}
+                    }}
+                }}}}}}
+            ],
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        revision = previous = None
+        if doc is None:
+            doc = await self.db.subjects.find_one({"name": subject_name}, projection)
+            if doc is None:
+                raise SubjectNotFound(subject_name)
+        else:
+            revision, previous = doc["rev"], doc["prev_rev"]
+        return revision, previous, {topic["id"]: topic for topic in doc["topics"]}
+
+    async def set_topic(self, subject_name: str, topic_id: str, completed: bool,
+                        base_rev: Optional[int] = None) -> dict:
+        revision, previous, topics = await self.set_topics(subject_name, {topic_id: completed}, base_rev)
+        topic = topics.get(topic_id)
+        if topic is None:
+            raise TopicNotFound(topic_id)
+        if revision is not None and topic.get("rev") == revision:
+            return {"status": "updated", "revision": revision, "completed": completed, "previous": previous}
+        return _outcome(topic, completed, base_rev) or {
+            "status": "conflict", "revision": topic.get("rev", 0), "completed": topic["completed"]
+        }
+
+
+class MemoryStorage(Storage):
+    """Everything in process memory.
+
+    Each operation runs to completion without awaiting, so on the event loop
+    every read and write is atomic without any locks.
+    """
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._subjects: Dict[str, dict] = {}
+        self._revision = 0
+
+    async def prepare(self, curriculum: Dict[str, List[str]]):
+        for name, titles in curriculum.items():
+            if name not in self._subjects:
+                topics = _new_topics(titles)
+                self._subjects[name] = {"id": str(uuid.uuid4()), "topics": topics,
+                                        "by_id": {topic["id"]: topic for topic in topics}}
+
+    async def subject_summaries(self) -> List[dict]:
+        return [{
+            "id": subject["id"],
+            "name": name,
+            "total_topics": len(subject["topics"]),
+            "completed_topics": sum(1 for topic in subject["topics"] if topic["completed"])
+        } for name, subject in self._subjects.items()]
+
+    async def list_topics(self, subject_name: str) -> List[dict]:
+        subject = self._subjects.get(subject_name)
+        if subject is None:
+            raise SubjectNotFound(subject_name)
+        return [dict(topic) for topic in subject["topics"]]
+
+    async def subject_versions(self) -> Dict[str, int]:
+        return {name: max((topic["rev"] for topic in subject["topics"]), default=0)
+                for name, subject in self._subjects.items()}
+
+    async def set_topic(self, subject_name: str, topic_id: str, completed: bool,
+                        base_rev: Optional[int] = None) -> dict:
+        subject = self._subjects.get(subject_name)
+        if subject is None:
+            raise SubjectNotFound(subject_name)
+        topic = subject["by_id"].get(topic_id)
+        if topic is None:
+            raise TopicNotFound(topic_id)
+        outcome = _outcome(topic, completed, base_rev)
+        if outcome:
+            return outcome
+        previous = max(other["rev"] for other in subject["topics"])
+        self._revision += 1
+        topic["completed"] = completed
+        topic["rev"] = self._revision
+        return {"status": "updated", "revision": self._revision, "completed": completed, "previous": previous}
+
+
+class SQLiteStorage(Storage):
+    """Single-file SQLite database in WAL mode.
+
+    All statements run on one dedicated thread, which serialises writers the
+    way SQLite does anyway while WAL keeps readers from blocking on them.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS subjects (
+            name TEXT PRIMARY KEY,
+            id TEXT NOT NULL,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS topics (
+            id TEXT PRIMARY KEY,
+            subject TEXT NOT NULL REFERENCES subjects(name),
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            week TEXT,
+            idx INTEGER NOT NULL,
+            rev INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS topics_subject ON topics (subject, position);
+        CREATE INDEX IF NOT EXISTS topics_subject_rev ON topics (subject, rev);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def _prepare(self, curriculum: Dict[str, List[str]]):
+        connection = self._connect()
+        # Read under the write lock: worker processes starting together must not seed a subject twice
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = {row["name"] for row in connection.execute("SELECT name FROM subjects")}
+            for position, (name, titles) in enumerate(curriculum.items()):
+                if name in existing:
+                    continue
+                connection.execute("INSERT INTO subjects (name, id, position) VALUES (?, ?, ?)",
+                                   (name, str(uuid.uuid4()), position))
+                connection.executemany(
+                    "INSERT INTO topics (id, subject, position, title, idx) VALUES (?, ?, ?, ?, ?)",
+                    [(topic["id"], name, topic["idx"], topic["title"], topic["idx"]) for topic in _new_topics(titles)]
+                )
+            connection.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('revision', 0)")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    async def prepare(self, curriculum: Dict[str, List[str]]):
+        await self._run(self._prepare, curriculum)
+
+    def _subject_summaries(self) -> List[dict]:
+        rows = self._connect().execute("""
+            SELECT s.id, s.name, COUNT(t.id) AS total_topics, COALESCE(SUM(t.completed), 0) AS completed_topics
+            FROM subjects s LEFT JOIN topics t ON t.subject = s.name
+            GROUP BY s.name ORDER BY s.position
+        """)
+        return [dict(row) for row in rows]
+
+    async def subject_summaries(self) -> List[dict]:
+        return await self._run(self._subject_summaries)
+
+    def _list_topics(self, subject_name: str) -> List[dict]:
+        connection = self._connect()
+        rows = connection.execute(
+            "SELECT id, title, completed, week, idx, rev FROM topics WHERE subject = ? ORDER BY position",
+            (subject_name,)
+        ).fetchall()
+        if not rows and connection.execute("SELECT 1 FROM subjects WHERE name = ?", (subject_name,)).fetchone() is None:
+            raise SubjectNotFound(subject_name)
+        return [dict(row, completed=bool(row["completed"])) for row in rows]
+
+    async def list_topics(self, subject_name: str) -> List[dict]:
+        return await self._run(self._list_topics, subject_name)
+
+    def _subject_versions(self) -> Dict[str, int]:
+        # Revisions are taken inside the writing transaction, so the newest one moves with every commit
+        rows = self._connect().execute("SELECT subject, MAX(rev) AS rev FROM topics GROUP BY subject")
+        return {row["subject"]: row["rev"] for row in rows}
+
+    async def subject_versions(self) -> Dict[str, int]:
+        return await self._run(self._subject_versions)
+
+    def _query_topics(self, subject_name: str, completed: Optional[bool], week: Optional[str],
+                      after: Optional[str], limit: Optional[int]) -> List[dict]:
+        connection = self._connect()
+        if connection.execute("SELECT 1 FROM subjects WHERE name = ?", (subject_name,)).fetchone() is None:
+            raise SubjectNotFound(subject_name)
+        start = -1
+        if after is not None:
+            row = connection.execute("SELECT position FROM topics WHERE subject = ? AND id = ?",
+                                     (subject_name, after)).fetchone()
+            if row is None:
+                raise TopicNotFound(after)
+            start = row["position"]
+
+        sql = "SELECT id, title, completed, week, idx, rev FROM topics WHERE subject = ? AND position > ?"
+        params = [subject_name, start]
+        if completed is not None:
+            sql += " AND completed = ?"
+            params.append(int(completed))
+        if week is not None:
+            sql += " AND week = ?"
+            params.append(week)
+        sql += " ORDER BY position LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return [dict(row, completed=bool(row["completed"])) for row in connection.execute(sql, params)]
+
+    async def query_topics(self, subject_name: str, completed: Optional[bool] = None, week: Optional[str] = None,
+                           after: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        return await self._run(self._query_topics, subject_name, completed, week, after, limit)
+
+    def _next_revision(self, connection: sqlite3.Connection, count: int) -> int:
+        connection.execute("UPDATE counters SET value = value + ? WHERE name = 'revision'", (count,))
+        value = connection.execute("SELECT value FROM counters WHERE name = 'revision'").fetchone()[0]
+        return value - count + 1
+
+    def _set_topic(self, subject_name: str, topic_id: str, completed: bool, base_rev: Optional[int]) -> dict:
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT completed, rev FROM topics WHERE subject = ? AND id = ?",
+                                     (subject_name, topic_id)).fetchone()
+            if row is None:
+                if connection.execute("SELECT 1 FROM subjects WHERE name = ?", (subject_name,)).fetchone() is None:
+                    raise SubjectNotFound(subject_name)
+                raise TopicNotFound(topic_id)
+            outcome = _outcome({"completed": bool(row["completed"]), "rev": row["rev"]}, completed, base_rev)
+            if outcome:
+                connection.execute("COMMIT")
+                return outcome
+            previous = connection.execute("SELECT MAX(rev) FROM topics WHERE subject = ?",
+                                          (subject_name,)).fetchone()[0]
+            revision = self._next_revision(connection, 1)
+            connection.execute("UPDATE topics SET completed = ?, rev = ? WHERE id = ?",
+                               (int(completed), revision, topic_id))
+            connection.execute("COMMIT")
+            return {"status": "updated", "revision": revision, "completed": completed, "previous": previous}
+        except Exception:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+    async def set_topic(self, subject_name: str, topic_id: str, completed: bool,
+                        base_rev: Optional[int] = None) -> dict:
+        return await self._run(self._set_topic, subject_name, topic_id, completed, base_rev)
+
+    async def close(self):
+        def _close():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        await self._run(_close)
+        self._executor.shutdown(wait=False)
+
+
+def create_storage(backend: str, db, subject_names: List[str], sqlite_path: str) -> Storage:
+    """Storage engine for the STORAGE_BACKEND setting"""
+    if backend == "mongo":
+        return MotorStorage(db, subject_names)
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected mongo, memory or sqlite")
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# strftime formats of the bucket labels; they sort chronologically as strings
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V"}
+
+# claimed_at of a batch handed back by a rollup that yielded to a rebuild: stale at once
+RELEASED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class RebuildInProgress(RuntimeError):
+    """Another rebuild holds the timeline lock"""
+
+
+def topic_event(subject: str, topic_id: str, completed: bool, revision: int,
+                user_id: Optional[str] = None) -> dict:
+    """One entry of the toggle log, not yet rolled up"""
+    return {
+        "subject": subject,
+        "topic_id": topic_id,
+        "user_id": user_id,
+        "completed": completed,
+        "revision": revision,
+        "at": datetime.now(timezone.utc),
+        "rolled_up": False,
+        "rollup_token": None
+    }
+
+
+class Timeline:
+    """Append-only log of topic toggles with incremental daily/weekly rollups.
+
+    Every effective toggle is inserted into topic_events. rollup() claims pending
+    events in batches, adds them to per-bucket counters in progress_buckets (per
+    subject, and per user for user toggles) and marks them rolled up. Chart reads
+    only touch the buckets, so their cost does not grow with the log.
+
+    A claim that is not finished within claim_timeout seconds is taken over by the
+    next rollup under the same token. Every bucket keeps the tokens of the batches
+    it received in the last 2 x claim_timeout, so a takeover skips the buckets the
+    first claimant already reached and a stalled claimant that wakes up skips the
+    buckets its successor reached. Only a claimant stalled past that window is
+    counted twice, until rebuild() recomputes the buckets.
+
+    rebuild() takes a lock that rollups check after claiming; a rollup that finds
+    it held hands its batch back, and rebuild waits for the claims in flight to
+    finish before it replaces the buckets.
+    """
+
+    def __init__(self, db, tz: tzinfo, batch_size: int = 1000, claim_timeout: float = 300,
+                 lock_timeout: float = 3600):
+        self.db = db
+        self.tz = tz
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        self.lock_timeout = lock_timeout
+
+    async def prepare(self):
+        # Only pending events are indexed, so the index stays small as the log grows
+        await self.db.topic_events.create_index([("rolled_up", 1), ("_id", 1)],
+                                                partialFilterExpression={"rolled_up": False})
+        await self.db.topic_events.create_index("rollup_token", sparse=True)
+        await self.db.progress_buckets.create_index(
+            [("period", 1), ("user_id", 1), ("bucket", 1), ("subject", 1)], unique=True
+        )
+
+    def bucket(self, at: datetime, period: str) -> str:
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        return at.astimezone(self.tz).strftime(PERIOD_FORMATS[period])
+
+    async def record(self, events: List[dict]):
+        if events:
+            await self.db.topic_events.insert_many(events, ordered=False)
+
+    async def _claim(self) -> Tuple[Optional[str], List[dict]]:
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=self.claim_timeout)
+        # An abandoned batch is finished under its own token so the bucket ledgers recognise it
+        abandoned = await self.db.topic_events.find_one(
+            {"rolled_up": False, "rollup_token": {"$ne": None}, "claimed_at": {"$lt": stale}}, {"rollup_token": 1}
+        )
+        if abandoned is not None:
+            token = abandoned["rollup_token"]
+            taken = await self.db.topic_events.update_many(
+                {"rollup_token": token, "rolled_up": False, "claimed_at": {"$lt": stale}},
+                {"$set": {"claimed_at": now}}
+            )
+            if taken.modified_count:
+                return token, await self.db.topic_events.find({"rollup_token": token, "rolled_up": False}).to_list(None)
+
+        token = uuid.uuid4().hex
+        pending = {"rolled_up": False, "rollup_token": None}
+        cursor = self.db.topic_events.find(pending, {"_id": 1}).sort("_id", 1).limit(self.batch_size)
+        ids = [doc["_id"] async for doc in cursor]
+        if not ids:
+            return None, []
+        # Re-checking the pending filter makes each event go to exactly one claimant
+        await self.db.topic_events.update_many(
+            dict(pending, _id={"$in": ids}),
+            {"$set": {"rollup_token": token, "claimed_at": now}}
+        )
+        return token, await self.db.topic_events.find({"rollup_token": token, "rolled_up": False}).to_list(None)
+
+    def _increments(self, events: List[dict]) -> Dict[tuple, Dict[str, int]]:
+        increments = {}
+        for event in events:
+            for period in PERIOD_FORMATS:
+                key = (period, event.get("user_id"), self.bucket(event["at"], period), event["subject"])
+                counts = increments.setdefault(key, {"completed": 0, "uncompleted": 0})
+                counts["completed" if event["completed"] else "uncompleted"] += 1
+        return increments
+
+    def _apply(self, counts: Dict[str, int], token: str) -> List[dict]:
+        """Update pipeline adding a batch's counts to a bucket unless its ledger already has the batch"""
+        now = datetime.now(timezone.utc)
+        expired = now - timedelta(seconds=2 * self.claim_timeout)
+        batches = {"$ifNull": ["$batches", []]}
+        return [
+            {"$set": {"_applied": {"$in": [token, {"$ifNull": ["$batches.token", []]}]}}},
+            {"$set": dict(
+                {field: {"$add": [{"$ifNull": [f"${field}", 0]}, {"$cond": ["$_applied", 0, value]}]}
+                 for field, value in counts.items()},
+                batches={"$cond": ["$_applied", batches, {"$concatArrays": [
+                    {"$filter": {"input": batches, "as": "batch", "cond": {"$gt": ["$$batch.at", expired]}}},
+                    [{"token": token, "at": now}]
+                ]}]}
+            )},
+            {"$project": {"_applied": 0}}
+        ]
+
+    async def _rebuilding(self) -> bool:
+        lock = await self.db.timeline_locks.find_one({"_id": "rebuild", "until": {"$gt": datetime.now(timezone.utc)}})
+        return lock is not None
+
+    async def rollup(self) -> int:
+        """Fold every pending event into the buckets; returns how many were rolled up"""
+        total = 0
+        while True:
+            token, events = await self._claim()
+            if not events:
+                return total
+            # The claim is written before this check, so a rebuild that took the lock first either
+            # shows up here or sees the claim in flight and waits for it
+            if await self._rebuilding():
+                await self.db.topic_events.update_many(
+                    {"rollup_token": token, "rolled_up": False}, {"$set": {"claimed_at": RELEASED}}
+                )
+                return total
+            operations = [
+                UpdateOne({"period": period, "user_id": user_id, "bucket": bucket, "subject": subject},
+                          self._apply(counts, token), upsert=True)
+                for (period, user_id, bucket, subject), counts in self._increments(events).items()
+            ]
+            await self.db.progress_buckets.bulk_write(operations, ordered=False)
+            await self.db.topic_events.update_many(
+                {"rollup_token": token},
+                {"$set": {"rolled_up": True}, "$unset": {"rollup_token": "", "claimed_at": ""}}
+            )
+            total += len(events)
+
+    async def rebuild(self) -> dict:
+        """Recompute all buckets from the full log while rollups are held off"""
+        token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        try:
+            await self.db.timeline_locks.update_one(
+                {"_id": "rebuild", "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=self.lock_timeout), "token": token}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise RebuildInProgress("a timeline rebuild is already running") from None
+        try:
+            await self._drain()
+            return await self._rebuild(token)
+        finally:
+            await self.db.timeline_locks.delete_one({"_id": "rebuild", "token": token})
+
+    async def _drain(self):
+        """Wait until no rollup holds a live claim; claims older than claim_timeout count as abandoned"""
+        while True:
+            stale = datetime.now(timezone.utc) - timedelta(seconds=self.claim_timeout)
+            if await self.db.topic_events.find_one({"rolled_up": False, "claimed_at": {"$gte": stale}}) is None:
+                return
+            await asyncio.sleep(min(0.1, self.claim_timeout))
+
+    async def _rebuild(self, token: str) -> dict:
+        # Released, so a rollup takes the events over if this rebuild dies before marking them
+        await self.db.topic_events.update_many({"rolled_up": False},
+                                               {"$set": {"rollup_token": token, "claimed_at": RELEASED}})
+        timezone_name = str(self.tz)
+        buckets = []
+        for period, bucket_format in PERIOD_FORMATS.items():
+            pipeline = [
+                {"$match": {"$or": [{"rolled_up": True}, {"rollup_token": token}]}},
+                {"$group": {
+                    "_id": {
+                        "user_id": "$user_id",
+                        "subject": "$subject",
+                        "bucket": {"$dateToString": {"date": "$at", "format": bucket_format,
+                                                     "timezone": timezone_name}}
+                    },
+                    "completed": {"$sum": {"$cond": ["$completed", 1, 0]}},
+                    "uncompleted": {"$sum": {"$cond": ["$completed", 0, 1]}}
+                }}
+            ]
+            async for group in self.db.topic_events.aggregate(pipeline, allowDiskUse=True):
+                buckets.append(dict(group["_id"], period=period, completed=group["completed"],
+                                    uncompleted=group["uncompleted"]))
+
+        await self.db.progress_buckets.delete_many({})
+        if buckets:
+            await self.db.progress_buckets.insert_many(buckets)
+        await self.db.topic_events.update_many(
+            {"rollup_token": token},
+            {"$set": {"rolled_up": True}, "$unset": {"rollup_token": "", "claimed_at": ""}}
+        )
+        return {"buckets": len(buckets)}
+
+    async def read(self, period: str, start: str, end: str, user_id: Optional[str] = None,
+                   subject: Optional[str] = None) -> List[dict]:
+        """Bucket counters between two labels (inclusive), summed over subjects unless one is given"""
+        query = {"period": period, "user_id": user_id, "bucket": {"$gte": start, "$lte": end}}
+        if subject is not None:
+            query["subject"] = subject
+        totals = {}
+        cursor = self.db.progress_buckets.find(query, {"_id": 0, "bucket": 1, "completed": 1, "uncompleted": 1})
+        async for doc in cursor.sort("bucket", 1):
+            counts = totals.setdefault(doc["bucket"], {"bucket": doc["bucket"], "completed": 0, "uncompleted": 0})
+            counts["completed"] += doc.get("completed", 0)
+            counts["uncompleted"] += doc.get("uncompleted", 0)
+        return [dict(counts, net=counts["completed"] - counts["uncompleted"]) for counts in totals.values()]
+
+    async def run(self, interval: float):
+        """Background loop rolling up new events every `interval` seconds"""
+        while True:
+            try:
+                await self.rollup()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Timeline rollup failed")
+            await asyncio.sleep(interval)
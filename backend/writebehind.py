@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TopicKey = Tuple[str, str]
+
+
+class WriteBehindBuffer:
+    """Pending topic states, acknowledged at once and written in merged batches.
+
+    Only the latest state of each topic is kept. A topic flipped back to the state
+    it had when it was first buffered drops out entirely, so a quick on/off never
+    reaches the database. flush() hands everything pending to `write` in one call;
+    it runs every `interval` seconds from run(), or sooner once `max_ops` topics
+    are pending. While a batch is being written its states stay visible to
+    readers through state().
+    """
+
+    def __init__(self, write: Callable[[List[dict]], Awaitable[None]], interval: float, max_ops: int = 500):
+        self.write = write
+        self.interval = interval
+        self.max_ops = max_ops
+        self.accepted = 0
+        self.written = 0
+        self.flushes = 0
+        self._pending: Dict[TopicKey, dict] = {}
+        self._flushing: Dict[TopicKey, dict] = {}
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+
+    def state(self, subject: str, topic_id: str) -> Optional[bool]:
+        """Completion state not yet in the database, or None"""
+        change = self._pending.get((subject, topic_id)) or self._flushing.get((subject, topic_id))
+        return change["completed"] if change else None
+
+    def subject_changes(self, subject: str) -> Dict[str, bool]:
+        """topic_id -> pending completion state for one subject"""
+        changes = {topic_id: change["completed"] for (name, topic_id), change in self._flushing.items()
+                   if name == subject}
+        changes.update({topic_id: change["completed"] for (name, topic_id), change in self._pending.items()
+                        if name == subject})
+        return changes
+
+    def put(self, subject: str, topic_id: str, completed: bool, current: bool):
+        """Buffer a change of a topic whose effective state is `current`"""
+        self.accepted += 1
+        key = (subject, topic_id)
+        change = self._pending.get(key)
+        if change is None:
+            self._pending[key] = {"subject": subject, "topic_id": topic_id, "completed": completed, "base": current}
+        elif completed == change["base"]:
+            del self._pending[key]
+        else:
+            change["completed"] = completed
+        if len(self._pending) >= self.max_ops:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Write everything pending as one batch; returns the number of topics written"""
+        async with self._lock:
+            self._full.clear()
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            batch = list(self._flushing.values())
+            try:
+                await self.write(batch)
+            except BaseException:
+                # Requeue the batch; a newer state of the same topic now starts from the old base
+                for key, change in self._flushing.items():
+                    newer = self._pending.get(key)
+                    if newer is None:
+                        self._pending[key] = change
+                    elif newer["completed"] == change["base"]:
+                        del self._pending[key]
+                    else:
+                        newer["base"] = change["base"]
+                raise
+            finally:
+                self._flushing = {}
+            self.written += len(batch)
+            self.flushes += 1
+            return len(batch)
+
+    async def run(self):
+        """Background loop flushing every interval, or as soon as the buffer is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "accepted": self.accepted,
+            "written": self.written,
+            "flushes": self.flushes,
+            "coalesced": self.accepted - self.written - len(self._pending),
+            "interval_ms": round(self.interval * 1000),
+            "max_ops": self.max_ops
+        }
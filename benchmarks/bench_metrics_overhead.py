@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the metrics instrumentation overhead
+Drives a one-route FastAPI app straight through ASGI (no sockets, no Mongo) with and
+without MetricsMiddleware, and times the pymongo command listener callbacks.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi import FastAPI  # noqa: E402
+
+from metrics import Metrics, MetricsMiddleware, MongoCommandMetrics  # noqa: E402
+
+REQUESTS = 20_000
+
+
+def build_app(instrumented):
+    app = FastAPI()
+
+    @app.get("/api/subjects/{subject_name}/topics")
+    async def topics(subject_name: str):
+        return {"subject": subject_name}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware, metrics=Metrics())
+    return app
+
+
+async def drive(app):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/api/subjects/Fizik/topics", "raw_path": b"/api/subjects/Fizik/topics",
+             "query_string": b"", "root_path": "", "headers": [], "server": ("test", 80), "client": ("test", 1)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def listener_cost():
+    listener = MongoCommandMetrics(Metrics())
+    started = SimpleNamespace(command={"find": "subjects"}, command_name="find", connection_id=("h", 1), request_id=0)
+    succeeded = SimpleNamespace(command_name="find", connection_id=("h", 1), request_id=0, duration_micros=800)
+    start = time.perf_counter()
+    for request_id in range(REQUESTS):
+        started.request_id = succeeded.request_id = request_id
+        listener.started(started)
+        listener.succeeded(succeeded)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+async def main():
+    plain = await drive(build_app(False))
+    instrumented = await drive(build_app(True))
+    print(f"📊 {REQUESTS:,} in-process requests")
+    print(f"without metrics   {plain:7.1f} µs/request")
+    print(f"with metrics      {instrumented:7.1f} µs/request  (+{instrumented - plain:.1f} µs, "
+          f"{(instrumented - plain) / plain * 100:.1f}%)")
+    print(f"command listener  {listener_cost():7.1f} µs/Mongo command")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
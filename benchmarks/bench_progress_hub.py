@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Load test for the live progress hub with thousands of idle subscribers
+Each subscriber is a task blocked on its queue, like an idle WebSocket/SSE handler.
+Reports memory per subscriber, publish cost and time until every subscriber has the event.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from events import ProgressHub  # noqa: E402
+
+SUBSCRIBERS = [1_000, 5_000, 20_000]
+EVENTS = 50
+
+
+async def run(subscriber_count):
+    hub = ProgressHub()
+    received = 0
+    done = asyncio.Event()
+
+    async def consumer(subscription):
+        nonlocal received
+        while True:
+            if await subscription.get() is None:
+                return
+            received += 1
+            if received == subscriber_count:
+                done.set()
+
+    tracemalloc.start()
+    subscriptions = [hub.subscribe() for _ in range(subscriber_count)]
+    tasks = [asyncio.ensure_future(consumer(subscription)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    per_subscriber = tracemalloc.get_traced_memory()[0] / subscriber_count
+    tracemalloc.stop()
+
+    publish_ms, delivery_ms = [], []
+    for revision in range(EVENTS):
+        received = 0
+        done.clear()
+        start = time.perf_counter()
+        hub.publish({"type": "topic", "subject": "Fizik", "topic_id": "x", "completed": True,
+                     "revision": revision})
+        publish_ms.append((time.perf_counter() - start) * 1000)
+        await done.wait()
+        delivery_ms.append((time.perf_counter() - start) * 1000)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"{subscriber_count:>7,} subscribers  {per_subscriber / 1024:5.1f} KiB each  "
+          f"publish {statistics.median(publish_ms):7.2f} ms  "
+          f"all delivered {statistics.median(delivery_ms):7.2f} ms (median of {EVENTS})")
+
+
+async def main():
+    print("📊 ProgressHub fan-out")
+    for subscriber_count in SUBSCRIBERS:
+        await run(subscriber_count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
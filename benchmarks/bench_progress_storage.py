@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Storage benchmark for per-student progress at 100k simulated students
+Compares packed bitset documents against a full copy of the subject documents per student.
+Sizes are BSON document sizes as MongoDB would store them (before compression).
+"""
+
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import bson
+from bson.int64 import Int64
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+STUDENTS = 100_000
+
+
+def bitset_docs(user_id, rng):
+    for name, titles in server.CURRICULUM_DATA.items():
+        yield {"_id": bson.ObjectId(), "user_id": user_id, "subject": name,
+               "bits": Int64(rng.getrandbits(len(titles)))}
+
+
+def copied_docs(user_id, rng):
+    for name in server.CURRICULUM_DATA.keys():
+        doc = server._new_subject_doc(name)
+        for topic in doc["topics"]:
+            topic["completed"] = rng.random() < 0.5
+        yield dict(doc, _id=bson.ObjectId(), user_id=user_id)
+
+
+def measure(label, factory):
+    rng = random.Random(12)
+    start = time.perf_counter()
+    total = 0
+    for _ in range(STUDENTS):
+        user_id = str(uuid.uuid4())
+        total += sum(len(bson.encode(doc)) for doc in factory(user_id, rng))
+    elapsed = time.perf_counter() - start
+    subjects = len(server.CURRICULUM_DATA)
+    print(f"{label:<16} {total / 2**20:9.1f} MiB total  "
+          f"{total / STUDENTS:8.0f} B/student  {total / STUDENTS / subjects:7.0f} B/subject doc  "
+          f"({elapsed:.1f}s to encode)")
+    return total
+
+
+def main():
+    print(f"📊 Progress storage for {STUDENTS:,} students x {len(server.CURRICULUM_DATA)} subjects")
+    bitsets = measure("bitset", bitset_docs)
+    copies = measure("copied subjects", copied_docs)
+    print(f"bitset storage is {copies / bitsets:.0f}x smaller "
+          f"(the bits themselves are 8 bytes per subject; the rest is user_id, subject and _id)")
+
+
+if __name__ == "__main__":
+    main()
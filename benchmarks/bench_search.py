@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Latency of the curriculum search index
+Times building the index and answering typical search-as-you-type queries, both in
+the index alone and end to end through GET /api/search on the in-memory storage engine.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from search import SearchIndex  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+ITERATIONS = 2000
+# Search-as-you-type fires on every keystroke; an index lookup should stay well inside this
+BUDGET_US = 1000
+QUERIES = ["k", "kim", "kimyasal t", "ISIK", "türev uyg", "elektrik alan", "sekil"]
+
+
+def percentiles(samples):
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+async def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    start = time.perf_counter()
+    index = SearchIndex(server.CURRICULUM_DATA)
+    print(f"📊 Index over {index.stats()['documents']} documents built in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    for query in QUERIES:
+        samples = []
+        for _ in range(ITERATIONS):
+            start = time.perf_counter()
+            hits = index.search(query, 20)
+            samples.append((time.perf_counter() - start) * 1e6)
+        p50, p99 = percentiles(samples)
+        flag = "  over budget" if p99 > BUDGET_US else ""
+        print(f"index    {query!r:<16} {len(hits):3d} hits  p50 {p50:7.1f} µs  p99 {p99:7.1f} µs{flag}")
+
+    server.storage = MemoryStorage()
+    await server.storage.prepare(server.CURRICULUM_DATA)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for query in QUERIES:
+            samples = []
+            for _ in range(ITERATIONS // 10):
+                start = time.perf_counter()
+                await http.get("/api/search", params={"q": query})
+                samples.append((time.perf_counter() - start) * 1e6)
+            p50, p99 = percentiles(samples)
+            print(f"endpoint {query!r:<16}           p50 {p50:7.1f} µs  p99 {p99:7.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Comparative benchmark of the storage engines behind the subject/topic endpoints
+Times subject summaries, topic listing and toggling on the memory and SQLite (WAL)
+engines, plus MongoDB when MONGO_URL from backend/.env is reachable.
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from storage import MemoryStorage, MotorStorage, SQLiteStorage  # noqa: E402
+
+ITERATIONS = 500
+CONCURRENT_TOGGLES = 2000
+
+
+async def timed(func, iterations=ITERATIONS):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+async def bench(engine):
+    rng = random.Random(12)
+    topics = {name: [topic["id"] for topic in await engine.list_topics(name)] for name in server.CURRICULUM_DATA}
+
+    def toggle():
+        subject = rng.choice(list(topics))
+        return engine.set_topic(subject, rng.choice(topics[subject]), rng.random() < 0.5)
+
+    summaries = await timed(engine.subject_summaries)
+    listing = await timed(lambda: engine.list_topics("Fizik"))
+    toggles = await timed(toggle)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(toggle() for _ in range(CONCURRENT_TOGGLES)))
+    throughput = CONCURRENT_TOGGLES / (time.perf_counter() - start)
+
+    print(f"{engine.name:<8} summaries {summaries:9.1f} µs  list_topics {listing:9.1f} µs  "
+          f"set_topic {toggles:9.1f} µs  concurrent toggles {throughput:9.0f}/s")
+
+
+async def main():
+    print(f"📊 Storage engines, median of {ITERATIONS} calls")
+    memory = MemoryStorage()
+    await memory.prepare(server.CURRICULUM_DATA)
+    await bench(memory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite = SQLiteStorage(os.path.join(directory, "curriculum.db"))
+        await sqlite.prepare(server.CURRICULUM_DATA)
+        await bench(sqlite)
+        await sqlite.close()
+
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        print(f"mongo    skipped ({e.__class__.__name__}: MongoDB not reachable)")
+        return
+    db = client[os.environ["DB_NAME"] + "_bench_storage"]
+    await client.drop_database(db.name)
+    server.db = db
+    server.storage = MotorStorage(db, list(server.CURRICULUM_DATA.keys()))
+    await server.seed_curriculum()
+    await bench(server.storage)
+    await client.drop_database(db.name)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /api/subjects
+Compares the legacy per-subject find_one loop against the aggregation pipeline.
+Runs against the MongoDB configured in backend/.env (MONGO_URL / DB_NAME).
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+ITERATIONS = 200
+
+
+async def legacy_get_subjects():
+    """The original handler: one find_one per subject, counting in Python"""
+    subjects = []
+    for name in server.CURRICULUM_DATA.keys():
+        subject_doc = await server.db.subjects.find_one({"name": name})
+        total_topics = len(subject_doc["topics"])
+        completed_topics = sum(1 for topic in subject_doc["topics"] if topic["completed"])
+        completion_rate = (completed_topics / total_topics * 100) if total_topics > 0 else 0
+        subjects.append({
+            "id": subject_doc["id"],
+            "name": subject_doc["name"],
+            "total_topics": total_topics,
+            "completed_topics": completed_topics,
+            "completion_rate": round(completion_rate, 1)
+        })
+    return subjects
+
+
+async def measure(label, func):
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(samples):7.3f} ms  "
+          f"p50 {statistics.median(samples):7.3f} ms  p95 {p95:7.3f} ms")
+
+
+async def main():
+    server.connect()
+    await server.seed_curriculum()
+    summaries = {doc["name"]: doc for doc in await server.storage.subject_summaries()}
+    for subject in await legacy_get_subjects():
+        assert summaries[subject["name"]]["completed_topics"] == subject["completed_topics"]
+
+    # The pipeline itself, without the subject cache in front of it
+    print(f"📊 GET /api/subjects, {ITERATIONS} iterations")
+    await measure("before", legacy_get_subjects)
+    await measure("after", server.storage.subject_summaries)
+    server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
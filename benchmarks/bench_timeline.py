@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Chart reads from the timeline buckets as the toggle log grows
+Appends synthetic toggle events in steps up to millions of rows, rolls them up
+incrementally and times a 12-week chart read from the buckets against the same
+chart aggregated straight from the raw log. Runs against the MongoDB configured
+in backend/.env (MONGO_URL / DB_NAME), in a scratch database.
+
+    python benchmarks/bench_timeline.py --steps 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from timeline import Timeline, topic_event  # noqa: E402
+
+ITERATIONS = 50
+INSERT_BATCH = 10000
+WEEKS = 12
+
+
+def synthetic_events(count, rng, now):
+    subjects = list(server.CURRICULUM_DATA)
+    for _ in range(count):
+        event = topic_event(rng.choice(subjects), f"t{rng.randrange(60)}", rng.random() < 0.7,
+                            0, user_id=f"u{rng.randrange(5000)}" if rng.random() < 0.8 else None)
+        event["at"] = now - timedelta(seconds=rng.randrange(WEEKS * 7 * 86400))
+        yield event
+
+
+async def raw_chart(db, start):
+    """The same chart computed from the log, for comparison"""
+    pipeline = [
+        {"$match": {"user_id": None, "at": {"$gte": start}}},
+        {"$group": {
+            "_id": {"$dateToString": {"date": "$at", "format": "%G-W%V", "timezone": str(server.TIMELINE_TZ)}},
+            "completed": {"$sum": {"$cond": ["$completed", 1, 0]}},
+            "uncompleted": {"$sum": {"$cond": ["$completed", 0, 1]}}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    return await db.topic_events.aggregate(pipeline).to_list(None)
+
+
+async def median_ms(func):
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main(args):
+    server.connect()
+    db = server.client[server.db.name + "_bench_timeline"]
+    await server.client.drop_database(db.name)
+    timeline = Timeline(db, server.TIMELINE_TZ, batch_size=args.batch_size)
+    await timeline.prepare()
+
+    rng = random.Random(12)
+    now = datetime.now(timezone.utc)
+    start_label = timeline.bucket(now - timedelta(weeks=WEEKS - 1), "week")
+    end_label = timeline.bucket(now, "week")
+
+    print(f"📊 {WEEKS}-week chart, median of {ITERATIONS} reads")
+    logged = 0
+    for target in args.steps:
+        pending = list(synthetic_events(target - logged, rng, now))
+        for offset in range(0, len(pending), INSERT_BATCH):
+            await timeline.record(pending[offset:offset + INSERT_BATCH])
+        logged = target
+
+        start = time.perf_counter()
+        rolled = await timeline.rollup()
+        rollup_rate = rolled / (time.perf_counter() - start)
+
+        buckets_ms = await median_ms(lambda: timeline.read("week", start_label, end_label))
+        raw_ms = await median_ms(lambda: raw_chart(db, now - timedelta(weeks=WEEKS)))
+        print(f"{logged:>9} events  rollup {rollup_rate:8.0f} events/s  "
+              f"buckets {buckets_ms:7.3f} ms  raw log {raw_ms:9.3f} ms")
+
+    await server.client.drop_database(db.name)
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="cumulative log sizes to measure at")
+    parser.add_argument("--batch-size", type=int, default=5000, help="events claimed per rollup batch")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Throughput of GET /api/subjects/{name}/topics with and without FAST_TOPICS
+The default path builds a Topic model per topic and lets FastAPI validate and encode
+the list; the fast path serves bytes encoded once per subject revision. Runs on the
+in-memory storage engine so only serialization differs between the two.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from cache import SubjectCache  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+REQUESTS = 5000
+CONCURRENCY = 16
+ENCODE_ITERATIONS = 20000
+
+
+async def throughput(http, fast):
+    server.FAST_TOPICS = fast
+    names = list(server.CURRICULUM_DATA)
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < REQUESTS:
+            issued += 1
+            response = await http.get(f"/api/subjects/{names[issued % len(names)]}/topics")
+            assert response.status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def encode_cost(topics):
+    start = time.perf_counter()
+    for _ in range(ENCODE_ITERATIONS):
+        [server.Topic(**topic) for topic in topics]
+    models = (time.perf_counter() - start) / ENCODE_ITERATIONS * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ENCODE_ITERATIONS):
+        server._encode_topics(topics)
+    encoded = (time.perf_counter() - start) / ENCODE_ITERATIONS * 1e6
+    return models, encoded
+
+
+async def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.storage = MemoryStorage()
+    await server.storage.prepare(server.CURRICULUM_DATA)
+    server.subject_cache = SubjectCache()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        golden = (await http.get("/api/subjects/Fizik/topics")).content
+        server.FAST_TOPICS = True
+        assert (await http.get("/api/subjects/Fizik/topics")).content == golden
+
+        print(f"📊 GET topics, {REQUESTS} requests at concurrency {CONCURRENCY}, "
+              f"encoder {'orjson' if server.orjson else 'json'}")
+        for label, fast in (("models", False), ("fast path", True)):
+            print(f"{label:<10} {await throughput(http, fast):9.0f} req/s")
+
+    topics = await server.storage.list_topics("Fizik")
+    models, encoded = encode_cost(topics)
+    print(f"Fizik ({len(topics)} topics): Topic models {models:.1f} µs, direct encoding {encoded:.1f} µs per list")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
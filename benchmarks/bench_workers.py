@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Multi-worker throughput of the topic endpoints under uvicorn
+For every worker count, starts `uvicorn server:app --workers N` on a local port, waits
+until /api/health/ready answers (caches are warmed in the lifespan before that), then
+drives GET /api/subjects, GET /api/subjects/{name}/topics and, for --write-ratio of
+the requests, PUT toggles from several load generator processes. It reports
+requests/s and the speed-up over the first count, then checks that the workers
+agree: it sets known states, waits out the cache revalidation interval
+(CACHE_REVALIDATE_MS), reads them back over fresh connections, which the kernel
+spreads across the workers, and counts the answers that differ.
+
+Storage defaults to a fresh SQLite file shared by all workers. The memory engine
+gives every worker its own copy of the data, so its toggles are never seen by the
+other workers and the agreement check fails by design; it only measures the
+server's own scaling. With mongo every worker opens its own client, so MongoDB sees
+up to workers x MONGO_MAX_POOL_SIZE connections and the pool size should be divided
+accordingly. Scaling stops at the number of cores, which is printed alongside.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --clients 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+SUBJECTS = ("Türkçe", "Fizik", "Kimya", "Biyoloji", "Matematik")
+
+
+async def drive(base_url, concurrency, duration, write_ratio):
+    done = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(number):
+        nonlocal done, errors
+        paths = ["/api/subjects"] + [f"/api/subjects/{name}/topics" for name in SUBJECTS]
+        step = number
+        rng = random.Random(number)
+        while time.perf_counter() < deadline:
+            if rng.random() < write_ratio:
+                name = rng.choice(SUBJECTS)
+                response = await http.put(f"/api/subjects/{name}/topics/{rng.choice(topic_ids[name])}",
+                                          json={"completed": rng.random() < 0.5})
+            else:
+                response = await http.get(paths[step % len(paths)])
+                step += 1
+            done += 1
+            if response.status_code >= 400:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as http:
+        topic_ids = {name: [topic["id"] for topic in (await http.get(f"/api/subjects/{name}/topics")).json()]
+                     for name in SUBJECTS}
+        await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    return done, errors
+
+
+async def check_agreement(base_url, reads, settle):
+    """Set a known state on every subject, then count reads over fresh connections that disagree"""
+    expected = {}
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        for number, name in enumerate(SUBJECTS):
+            topics = (await http.get(f"/api/subjects/{name}/topics")).json()
+            for position, topic in enumerate(topics):
+                completed = (position + number) % 3 == 0
+                if topic["completed"] != completed:
+                    await http.put(f"/api/subjects/{name}/topics/{topic['id']}", json={"completed": completed})
+            expected[name] = [(position + number) % 3 == 0 for position in range(len(topics))]
+    # Other workers drop their cached copies on their next revalidation
+    await asyncio.sleep(settle)
+
+    mismatches = 0
+    for attempt in range(reads):
+        name = SUBJECTS[attempt % len(SUBJECTS)]
+        # A new client per read opens a new connection, which may land on any worker
+        async with httpx.AsyncClient(base_url=base_url) as http:
+            topics = (await http.get(f"/api/subjects/{name}/topics")).json()
+            subjects = {doc["name"]: doc for doc in (await http.get("/api/subjects")).json()}
+        if [topic["completed"] for topic in topics] != expected[name] or \
+                subjects[name]["completed_topics"] != sum(expected[name]):
+            mismatches += 1
+    return mismatches
+
+
+def load_generator(base_url, concurrency, duration, write_ratio, results):
+    results.put(asyncio.run(drive(base_url, concurrency, duration, write_ratio)))
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health/ready", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(workers, args, env):
+    base_url = f"http://127.0.0.1:{args.port}"
+    if args.storage == "sqlite":
+        env = dict(env, SQLITE_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-workers-"), "curriculum.db"))
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        wait_ready(base_url, process)
+        # With several workers the first ready answer comes from one of them; give the rest a moment
+        time.sleep(0.5 * workers)
+        results = multiprocessing.Queue()
+        generators = [
+            multiprocessing.Process(target=load_generator,
+                                    args=(base_url, args.concurrency, args.duration, args.write_ratio, results))
+            for _ in range(args.clients)
+        ]
+        for generator in generators:
+            generator.start()
+        totals = [results.get() for _ in generators]
+        for generator in generators:
+            generator.join()
+        settle = 2 * int(env.get("CACHE_REVALIDATE_MS", 1000)) / 1000
+        mismatches = asyncio.run(check_agreement(base_url, args.agreement_reads, settle))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    requests = sum(done for done, _ in totals)
+    return {
+        "workers": workers,
+        "requests": requests,
+        "errors": sum(errors for _, errors in totals),
+        "throughput_rps": round(requests / args.duration, 1),
+        "agreement_reads": args.agreement_reads,
+        "mismatched_reads": mismatches,
+        "consistent": mismatches == 0
+    }
+
+
+def main(args):
+    # The live progress endpoints only run on a single worker
+    env = dict(os.environ, STORAGE_BACKEND=args.storage, PROGRESS_EVENTS="0")
+    if args.storage != "mongo":
+        # An empty value keeps load_dotenv from pulling MONGO_URL in from backend/.env
+        env["MONGO_URL"] = ""
+    report = {"cores": os.cpu_count(), "storage": args.storage, "clients": args.clients,
+              "concurrency": args.concurrency, "write_ratio": args.write_ratio, "duration_s": args.duration,
+              "runs": []}
+    for workers in args.workers:
+        result = run(workers, args, env)
+        baseline = report["runs"][0]["throughput_rps"] if report["runs"] else result["throughput_rps"]
+        result["speedup"] = round(result["throughput_rps"] / baseline, 2) if baseline else 0.0
+        report["runs"].append(result)
+        print(f"{workers:>3} workers  {result['throughput_rps']:>9.1f} req/s  "
+              f"x{result['speedup']:.2f}  errors={result['errors']}  "
+              f"disagreeing reads={result['mismatched_reads']}/{args.agreement_reads}", file=sys.stderr)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per load generator")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that toggle a topic")
+    parser.add_argument("--agreement-reads", type=int, default=50, help="fresh-connection reads checked afterwards")
+    parser.add_argument("--storage", choices=["sqlite", "memory", "mongo"], default="sqlite",
+                        help="mongo uses MONGO_URL; memory gives every worker its own data")
+    main(parser.parse_args())
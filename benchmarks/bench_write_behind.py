@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Write reduction of the write-behind toggle buffer under bursty clicking
+Simulated students double- and triple-click checkboxes and teachers sweep through
+topic lists, paced in real time. The same seeded workload runs once with direct
+writes and once through the buffer on the in-memory storage engine; the report
+compares topic writes, write round trips and acknowledgement latency. Round trips
+count one per direct toggle and one per flush, which is what the mongo engine does:
+a toggle or a whole flush is one counter update plus one (bulk) write.
+
+    python benchmarks/bench_write_behind.py --clients 200 --bursts 20 --interval-ms 50
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from cache import SubjectCache  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+from writebehind import WriteBehindBuffer  # noqa: E402
+
+
+def bursts(rng, topics, count):
+    """Click sequences: (subject, topic_id, completed, pause before the click in seconds)"""
+    for _ in range(count):
+        subject = rng.choice(list(topics))
+        if rng.random() < 0.2:
+            # Teacher sweep: a run of neighbouring topics, all checked
+            start = rng.randrange(len(topics[subject]))
+            for topic_id in topics[subject][start:start + rng.randint(5, 15)]:
+                yield subject, topic_id, True, 0.01
+        else:
+            # Student: the same checkbox clicked one to four times in quick succession
+            topic_id = rng.choice(topics[subject])
+            completed = rng.random() < 0.5
+            for _ in range(rng.randint(1, 4)):
+                yield subject, topic_id, completed, 0.03
+                completed = not completed
+        yield None, None, None, rng.uniform(0.05, 0.3)
+
+
+async def run(args, buffered):
+    server.storage = MemoryStorage()
+    await server.storage.prepare(server.CURRICULUM_DATA)
+    server.subject_cache = SubjectCache()
+    server.write_buffer = None
+    task = None
+    if buffered:
+        server.write_buffer = WriteBehindBuffer(server._write_topic_changes, args.interval_ms / 1000, args.max_ops)
+        task = asyncio.create_task(server.write_buffer.run())
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        topics = {name: [topic["id"] for topic in await server.storage.list_topics(name)]
+                  for name in server.CURRICULUM_DATA}
+        latencies = []
+        writes = 0
+
+        async def client(seed):
+            nonlocal writes
+            for subject, topic_id, completed, pause in bursts(random.Random(seed), topics, args.bursts):
+                await asyncio.sleep(pause)
+                if subject is None:
+                    continue
+                start = time.perf_counter()
+                response = await http.put(f"/api/subjects/{subject}/topics/{topic_id}", json={"completed": completed})
+                latencies.append((time.perf_counter() - start) * 1000)
+                writes += response.json()["modified_count"]
+
+        await asyncio.gather(*(client(args.seed + number) for number in range(args.clients)))
+
+    if buffered:
+        task.cancel()
+        await server.write_buffer.flush()
+        stats = server.write_buffer.stats()
+        writes, round_trips = stats["written"], stats["flushes"]
+    else:
+        round_trips = writes
+    latencies.sort()
+    return len(latencies), writes, round_trips, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def main(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(f"📊 {args.clients} clients x {args.bursts} bursts, flush every {args.interval_ms} ms "
+          f"or {args.max_ops} topics")
+    results = {}
+    for label, buffered in (("direct", False), ("buffered", True)):
+        clicks, writes, round_trips, p50, p99 = results[label] = await run(args, buffered)
+        print(f"{label:<9} {clicks:6d} clicks  {writes:6d} topic writes  {round_trips:6d} write round trips  "
+              f"ack p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+    direct, buffered = results["direct"], results["buffered"]
+    print(f"topic writes reduced {direct[1] / max(buffered[1], 1):.1f}x, "
+          f"write round trips reduced {direct[2] / max(buffered[2], 1):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=20, help="bursts per client")
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--max-ops", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=12)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the backend, run in-process
+Starts the FastAPI app on an ASGI transport against mongomock-motor (or a real MongoDB
+with --mongo-url), drives workloads with an async httpx client and prints a JSON report
+with throughput and latency percentiles, so results can be stored and compared over time.
+
+    python benchmarks/loadtest.py --workload all --concurrency 32 --requests 5000 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+WORKLOADS = ("homepage", "toggle-storm", "mixed")
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class Workload:
+    """Picks the next request for a workload; topics are loaded once up front"""
+
+    def __init__(self, name, topics, rng):
+        self.name = name
+        self.topics = topics
+        self.rng = rng
+
+    def _toggle(self):
+        subject = self.rng.choice(list(self.topics))
+        topic_id = self.rng.choice(self.topics[subject])
+        return "PUT", f"/api/subjects/{subject}/topics/{topic_id}", {"completed": self.rng.random() < 0.5}
+
+    def next_request(self):
+        if self.name == "homepage":
+            return "GET", "/api/subjects", None
+        if self.name == "toggle-storm":
+            return self._toggle()
+        # mixed: mostly reads, like students browsing with occasional checkbox clicks
+        roll = self.rng.random()
+        if roll < 0.4:
+            return "GET", "/api/subjects", None
+        if roll < 0.8:
+            return "GET", f"/api/subjects/{self.rng.choice(list(self.topics))}/topics", None
+        return self._toggle()
+
+
+async def run_workload(http, workload, concurrency, total):
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            issued += 1
+            method, url, body = workload.next_request()
+            start = time.perf_counter()
+            response = await http.request(method, url, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3)
+        }
+    }
+
+
+async def main(args):
+    # One log line per request would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        backend = "mongodb"
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        backend = "mongomock"
+    database = client[os.environ.get("DB_NAME", "test_database") + "_loadtest"]
+    if args.mongo_url:
+        await client.drop_database(database.name)
+    server.db = database
+    server.storage = server.MotorStorage(database, list(server.CURRICULUM_DATA.keys()))
+    server.timeline = server.Timeline(database, server.TIMELINE_TZ)
+    await server.prepare_database()
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=server.app)
+    report = {
+        "backend": backend,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "workloads": {}
+    }
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        topics = {}
+        for name in server.CURRICULUM_DATA.keys():
+            response = await http.get(f"/api/subjects/{name}/topics")
+            topics[name] = [topic["id"] for topic in response.json()]
+
+        names = WORKLOADS if args.workload == "all" else (args.workload,)
+        for name in names:
+            report["workloads"][name] = await run_workload(
+                http, Workload(name, topics, rng), args.concurrency, args.requests
+            )
+
+    if args.mongo_url:
+        await client.drop_database(database.name)
+        client.close()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", choices=WORKLOADS + ("all",), default="all")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per workload")
+    parser.add_argument("--mongo-url", help="run against a real MongoDB instead of mongomock-motor")
+    parser.add_argument("--seed", type=int, default=12)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,59 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@asynccontextmanager
+async def scratch_database():
+    """Empty database on the MongoDB from backend/.env, skipping the test when unreachable"""
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        client.close()
+        pytest.skip(f"MongoDB not reachable: {e}")
+
+    test_db = client[os.environ["DB_NAME"] + "_pytest"]
+    await client.drop_database(test_db.name)
+    try:
+        yield test_db
+    finally:
+        await client.drop_database(test_db.name)
+        client.close()
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    """Seeded scratch database wired into the server module"""
+    async with scratch_database() as test_db:
+        monkeypatch.setattr(server, "db", test_db)
+        monkeypatch.setattr(server, "storage", server.MotorStorage(test_db, list(server.CURRICULUM_DATA.keys())))
+        monkeypatch.setattr(server, "subject_cache", server.SubjectCache())
+        monkeypatch.setattr(server, "timeline", server.Timeline(test_db, server.TIMELINE_TZ))
+        await server.prepare_database()
+        # Like warm_up, so the first revalidation does not throw caches away
+        await server._revalidate_cache()
+        yield test_db
+
+
+@pytest.fixture
+async def api(db):
+    import httpx
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
@@ -0,0 +1,70 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_update_reports_per_item_results(api):
+    turkce = (await api.get("/api/subjects/Türkçe/topics")).json()
+    fizik = (await api.get("/api/subjects/Fizik/topics")).json()
+
+    response = await api.put("/api/topics/bulk", json={"updates": [
+        {"subject": "Türkçe", "topic_id": turkce[0]["id"], "completed": True},
+        {"subject": "Fizik", "topic_id": fizik[1]["id"], "completed": True},
+        {"subject": "Fizik", "topic_id": "missing", "completed": True},
+        {"subject": "Yok", "topic_id": fizik[2]["id"], "completed": True},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["status"] for item in body["results"]] == ["updated", "updated", "not_found", "not_found"]
+    assert body["results"][3]["detail"] == "Subject not found"
+    assert body["matched_count"] == 2
+    assert body["modified_count"] == 2
+
+    turkce = (await api.get("/api/subjects/Türkçe/topics")).json()
+    fizik = (await api.get("/api/subjects/Fizik/topics")).json()
+    assert turkce[0]["completed"] and fizik[1]["completed"]
+    assert not fizik[2]["completed"]
+
+
+async def test_ordered_bulk_update_stops_at_first_failure(api):
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+
+    response = await api.put("/api/topics/bulk", json={"ordered": True, "updates": [
+        {"subject": "Kimya", "topic_id": topics[0]["id"], "completed": True},
+        {"subject": "Kimya", "topic_id": "missing", "completed": True},
+        {"subject": "Kimya", "topic_id": topics[1]["id"], "completed": True},
+    ]})
+    assert [item["status"] for item in response.json()["results"]] == ["updated", "not_found", "skipped"]
+
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+    assert topics[0]["completed"] and not topics[1]["completed"]
+
+
+async def test_bulk_update_rejects_empty_batch(api):
+    response = await api.put("/api/topics/bulk", json={"updates": []})
+    assert response.status_code == 422
+
+
+async def test_bulk_re_marking_is_not_a_change(api, db):
+    import server
+
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+    first = await api.put("/api/topics/bulk", json={"updates": [
+        {"subject": "Kimya", "topic_id": topics[0]["id"], "completed": True}
+    ]})
+    revision = first.json()["results"][0]["revision"]
+    subscription = server.progress_hub.subscribe("Kimya")
+
+    for _ in range(3):
+        response = await api.put("/api/topics/bulk", json={"updates": [
+            {"subject": "Kimya", "topic_id": topics[0]["id"], "completed": True},
+            {"subject": "Kimya", "topic_id": topics[1]["id"], "completed": False}
+        ]})
+        body = response.json()
+        assert [item["status"] for item in body["results"]] == ["unchanged", "unchanged"]
+        assert body["results"][0]["revision"] == revision and body["modified_count"] == 0
+
+    assert subscription.queue.empty()
+    server.progress_hub.unsubscribe(subscription)
+    assert await db.topic_events.count_documents({}) == 1
+    assert (await db.subjects.find_one({"name": "Kimya"}))["rev"] == revision
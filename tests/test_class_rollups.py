@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def topic_stats(body, subject):
+    return next(s for s in body["subjects"] if s["name"] == subject)["topics"]
+
+
+async def test_rollups_follow_toggles_and_enrollment(api):
+    topics = (await api.get("/api/subjects/Fizik/topics")).json()
+    tork = next(t["id"] for t in topics if t["title"] == "Tork")
+
+    for user_id in ("ali", "veli", "ayse", "fatma"):
+        await api.put(f"/api/classes/12A/students/{user_id}")
+    # Progress made before enrolling moves into the class rollups
+    await api.put(f"/api/subjects/Fizik/topics/{tork}?user_id=zeynep", json={"completed": True})
+    await api.put("/api/classes/12A/students/zeynep")
+
+    for user_id in ("ali", "veli"):
+        await api.put(f"/api/subjects/Fizik/topics/{tork}?user_id={user_id}", json={"completed": True})
+    # Repeating a toggle must not double count
+    await api.put(f"/api/subjects/Fizik/topics/{tork}?user_id=ali", json={"completed": True})
+    await api.put(f"/api/subjects/Fizik/topics/{tork}?user_id=veli", json={"completed": False})
+
+    body = (await api.get("/api/classes/12A/progress")).json()
+    assert body["student_count"] == 5
+    stats = next(t for t in topic_stats(body, "Fizik") if t["id"] == tork)
+    assert stats["completed_count"] == 2
+    assert stats["completion_rate"] == 40.0
+
+    # Moving a student carries their progress to the new class
+    await api.put("/api/classes/12B/students/ali")
+    body = (await api.get("/api/classes/12A/progress")).json()
+    assert body["student_count"] == 4
+    assert next(t for t in topic_stats(body, "Fizik") if t["id"] == tork)["completed_count"] == 1
+
+
+async def test_rebuild_matches_incremental_counters(api):
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+    for user_id in ("ali", "veli"):
+        await api.put(f"/api/classes/12A/students/{user_id}")
+        for topic in topics[:3]:
+            await api.put(f"/api/subjects/Kimya/topics/{topic['id']}?user_id={user_id}", json={"completed": True})
+    incremental = (await api.get("/api/classes/12A/progress")).json()
+
+    await server.db.class_topic_counts.update_many({}, {"$set": {"counts": {}}})
+    response = await api.post("/api/classes/rollups/rebuild")
+    assert response.json() == {"classes": 1, "counters": 1}
+
+    assert (await api.get("/api/classes/12A/progress")).json() == incremental
+
+
+async def test_concurrent_first_toggles_are_all_counted(api):
+    topics = (await api.get("/api/subjects/Biyoloji/topics")).json()[:6]
+    await api.put("/api/classes/12C/students/deniz")
+
+    # All of these race to create the progress doc; none may see it without its class
+    await asyncio.gather(*(api.put(f"/api/subjects/Biyoloji/topics/{topic['id']}?user_id=deniz",
+                                   json={"completed": True}) for topic in topics))
+
+    body = (await api.get("/api/classes/12C/progress")).json()
+    assert [t["completed_count"] for t in topic_stats(body, "Biyoloji")[:7]] == [1] * 6 + [0]
+    progress = await server.db.progress.find_one({"user_id": "deniz", "subject": "Biyoloji"})
+    assert progress["class_id"] == "12C"
+
+
+async def test_unknown_class(api):
+    assert (await api.get("/api/classes/yok/progress")).status_code == 404
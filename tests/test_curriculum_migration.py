@@ -0,0 +1,123 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_seeding_is_idempotent(db):
+    report = await server.seed_curriculum()
+    assert report["unchanged"] == list(server.CURRICULUM_DATA.keys())
+    assert await db.subjects.count_documents({}) == len(server.CURRICULUM_DATA)
+
+
+async def test_changed_subject_is_diffed_by_title(db, monkeypatch):
+    before = (await db.subjects.find_one({"name": "Kimya"}))["topics"]
+    kept = before[0]
+    await db.subjects.update_one({"name": "Kimya", "topics.id": kept["id"]},
+                                 {"$set": {"topics.$.completed": True}})
+
+    titles = [topic["title"] for topic in before if topic["title"] != "Kimyasal Hesaplamalar"]
+    titles.insert(1, "Nükleer Kimya")
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Kimya", titles)
+
+    report = await server.seed_curriculum()
+    assert report["migrated"] == ["Kimya"]
+
+    after = (await db.subjects.find_one({"name": "Kimya"}))["topics"]
+    assert [topic["title"] for topic in after] == titles
+    assert after[0]["id"] == kept["id"] and after[0]["completed"] is True
+    assert after[1]["idx"] == len(before)
+    old_ids = {topic["title"]: (topic["id"], topic["idx"]) for topic in before}
+    assert all((topic["id"], topic["idx"]) == old_ids[topic["title"]] for topic in after if topic is not after[1])
+
+    assert (await server.seed_curriculum())["unchanged"] == list(server.CURRICULUM_DATA.keys())
+
+
+async def test_legacy_subject_gets_indexes_and_hash(db):
+    legacy = [{"id": f"t{position}", "title": title, "completed": position == 2}
+              for position, title in enumerate(server.CURRICULUM_DATA["Matematik"])]
+    await db.subjects.update_one({"name": "Matematik"},
+                                 {"$set": {"topics": legacy}, "$unset": {"content_hash": "", "next_idx": ""}})
+
+    assert (await server.seed_curriculum())["migrated"] == ["Matematik"]
+
+    doc = await db.subjects.find_one({"name": "Matematik"})
+    assert [topic["idx"] for topic in doc["topics"]] == list(range(len(legacy)))
+    assert [topic["id"] for topic in doc["topics"]] == [topic["id"] for topic in legacy]
+    assert doc["topics"][2]["completed"] is True
+    assert doc["content_hash"] == server._curriculum_hash("Matematik")
+
+
+def test_full_bitset_reuses_free_indexes(monkeypatch):
+    stored = [{"id": f"t{idx}", "title": f"Konu {idx}", "completed": False, "idx": idx} for idx in range(60)]
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Fizik", [f"Konu {idx}" for idx in range(60)] + ["Yeni 1", "Yeni 2"])
+
+    topics, next_idx = server._migrate_topics("Fizik", stored, server.MAX_TOPICS_PER_SUBJECT, reusable=[70, 4])
+
+    assert [topic["idx"] for topic in topics[-2:]] == [4, 70]
+    assert next_idx == server.MAX_TOPICS_PER_SUBJECT
+    with pytest.raises(server.CurriculumTooLarge):
+        server._migrate_topics("Fizik", stored, server.MAX_TOPICS_PER_SUBJECT, reusable=[4])
+
+
+async def test_removed_topics_free_their_bits(db, monkeypatch):
+    before = (await db.subjects.find_one({"name": "Fizik"}))["topics"]
+    await db.progress.insert_one({"user_id": "ali", "subject": "Fizik", "class_id": "12A", "bits": 0b111})
+    await db.class_topic_counts.insert_one({"class_id": "12A", "subject": "Fizik",
+                                            "counts": {"0": 1, "1": 1, "2": 1}})
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Fizik", [topic["title"] for topic in before[1:]])
+
+    assert (await server.seed_curriculum())["migrated"] == ["Fizik"]
+
+    assert (await db.progress.find_one({"user_id": "ali"}))["bits"] == 0b110
+    assert (await db.class_topic_counts.find_one({"class_id": "12A"}))["counts"] == {"1": 1, "2": 1}
+
+
+async def test_exhausted_bitset_fails_the_migration_not_the_startup(db, monkeypatch):
+    # Every index up to the limit has been handed out before; only 61 and 62 are still set somewhere
+    await db.subjects.update_one({"name": "Fizik"}, {"$set": {"next_idx": server.MAX_TOPICS_PER_SUBJECT}})
+    await db.progress.insert_one({"user_id": "ali", "subject": "Fizik", "bits": (1 << 61) | (1 << 62)})
+    titles = [topic["title"] for topic in (await db.subjects.find_one({"name": "Fizik"}))["topics"]]
+    free = server.MAX_TOPICS_PER_SUBJECT - len(titles) - 2
+
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Fizik", titles + [f"Yeni {number}" for number in range(free)])
+    assert (await server.seed_curriculum())["migrated"] == ["Fizik"]
+    reused = (await db.subjects.find_one({"name": "Fizik"}))["topics"][len(titles):]
+    assert [topic["idx"] for topic in reused] == list(range(len(titles), len(titles) + free))
+
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Fizik", server.CURRICULUM_DATA["Fizik"] + ["Bir fazla"])
+    report = await server.seed_curriculum()
+    assert report["failed"] == ["Fizik"]
+    assert len((await db.subjects.find_one({"name": "Fizik"}))["topics"]) == len(titles) + free
+    await server.load_topic_index()
+
+
+async def test_migration_does_not_overwrite_a_concurrent_toggle(db, monkeypatch):
+    topics = (await db.subjects.find_one({"name": "Kimya"}))["topics"]
+    monkeypatch.setitem(server.CURRICULUM_DATA, "Kimya", [topic["title"] for topic in topics] + ["Nükleer Kimya"])
+    toggled = False
+
+    class TogglingSubjects:
+        def __getattr__(self, attr):
+            return getattr(db.subjects, attr)
+
+        async def update_one(self, *args, **kwargs):
+            # The toggle lands after the migration read the subject and before its compare-and-set
+            nonlocal toggled
+            if not toggled:
+                toggled = True
+                await server.storage.set_topic("Kimya", topics[0]["id"], True)
+            return await db.subjects.update_one(*args, **kwargs)
+
+    class TogglingDatabase:
+        subjects = TogglingSubjects()
+
+        def __getattr__(self, attr):
+            return getattr(db, attr)
+
+    monkeypatch.setattr(server, "db", TogglingDatabase())
+    assert (await server.seed_curriculum())["migrated"] == ["Kimya"]
+
+    after = (await db.subjects.find_one({"name": "Kimya"}))["topics"]
+    assert after[0]["completed"] is True and after[-1]["title"] == "Nükleer Kimya"
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+TOPICS = {"Fizik": [{"id": f"t{idx}", "title": f"Konu {idx}", "idx": idx} for idx in range(50)]}
+
+
+async def synthetic_progress(count):
+    for number in range(count):
+        yield {"user_id": f"student-{number}", "class_id": "12A", "subject": "Fizik", "bits": number}
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks]).decode()
+
+
+async def test_ndjson_rows():
+    body = await collect(server.iter_progress_export(
+        synthetic_progress(2), ["user_id", "topic_id", "completed"], "ndjson", TOPICS))
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert len(rows) == 100
+    assert rows[50] == {"user_id": "student-1", "topic_id": "t0", "completed": True}
+    assert not any(row["completed"] for row in rows[:50])
+
+
+async def test_csv_rows():
+    body = await collect(server.iter_progress_export(
+        synthetic_progress(3), ["user_id", "title", "completed"], "csv", TOPICS))
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == ["user_id", "title", "completed"]
+    assert len(rows) == 151
+    assert rows[101] == ["student-2", "Konu 0", "False"]
+    assert rows[102] == ["student-2", "Konu 1", "True"]
+
+
+async def test_export_memory_stays_flat():
+    # 20k documents x 50 topics is 1M rows, ~40 MB of CSV; what is allocated at once must stay tiny
+    tracemalloc.start()
+    try:
+        rows = 0
+        async for chunk in server.iter_progress_export(
+                synthetic_progress(20_000), list(server.EXPORT_FIELDS), "csv", TOPICS):
+            rows += chunk.count(b"\n")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert rows == 1_000_001
+    assert peak < 1024 * 1024
+
+
+class CommandLog(monitoring.CommandListener):
+    def __init__(self, log):
+        self.log = log
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name == "getMore":
+            self.log.append("getMore")
+
+    def failed(self, event):
+        pass
+
+
+async def test_export_endpoint_streams_from_the_cursor(db, api, monkeypatch):
+    await db.progress.insert_many([{"user_id": f"student-{number}", "class_id": "12A", "subject": "Kimya",
+                                    "bits": number} for number in range(200)])
+    log = []
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[CommandLog(log)])
+    monkeypatch.setattr(server, "db", client[db.name])
+    export = server.iter_progress_export
+
+    async def logged_export(*args):
+        async for chunk in export(*args):
+            log.append("chunk")
+            yield chunk
+
+    monkeypatch.setattr(server, "iter_progress_export", logged_export)
+    try:
+        response = await api.get("/api/export/progress", params={"subject": "Kimya", "batch_size": 20,
+                                                                   "fields": "user_id,completed"})
+    finally:
+        client.close()
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 200 * len(server.CURRICULUM_DATA["Kimya"])
+    # Rows go out while the cursor is still being read, one batch at a time
+    assert log.count("chunk") == 200 and log.count("getMore") >= 9
+    assert log.index("chunk") < log.index("getMore")
+
+
+async def test_export_rejects_unknown_fields(api):
+    response = await api.get("/api/export/progress?fields=user_id,secret")
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import httpx
+import pytest
+
+import server
+from cache import SubjectCache
+from storage import MemoryStorage
+
+pytestmark = pytest.mark.anyio
+
+CURRICULUM = dict(server.CURRICULUM_DATA, **{
+    "Özel": ['Tırnak "işareti" ve \\ ters bölü', "Satır ayırıcı\tsekme\x01", "Emoji 📚 ve İı Ğğ Şş"]
+})
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    engine = MemoryStorage()
+    await engine.prepare(CURRICULUM)
+    list_topics = engine.list_topics
+
+    async def with_weeks(subject_name):
+        # Exercise the optional field both set and unset
+        topics = await list_topics(subject_name)
+        for topic in topics[::2]:
+            topic["week"] = f"2025-W{topic['idx'] + 1:02d}"
+        return topics
+
+    monkeypatch.setattr(engine, "list_topics", with_weeks)
+    monkeypatch.setattr(server, "storage", engine)
+    monkeypatch.setattr(server, "subject_cache", SubjectCache())
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+
+async def fetch_all(api, monkeypatch, fast):
+    monkeypatch.setattr(server, "FAST_TOPICS", fast)
+    responses = {}
+    for name in CURRICULUM:
+        response = await api.get(f"/api/subjects/{name}/topics")
+        assert response.status_code == 200
+        responses[name] = response
+    return responses
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+async def test_fast_path_is_byte_identical(api, monkeypatch, encoder):
+    if encoder == "json":
+        monkeypatch.setattr(server, "orjson", None)
+    topic_id = (await api.get("/api/subjects/Fizik/topics")).json()[1]["id"]
+    await api.put(f"/api/subjects/Fizik/topics/{topic_id}", json={"completed": True})
+
+    golden = await fetch_all(api, monkeypatch, False)
+    fast = await fetch_all(api, monkeypatch, True)
+
+    for name in CURRICULUM:
+        assert fast[name].content == golden[name].content
+        assert fast[name].headers["content-type"] == golden[name].headers["content-type"]
+        assert fast[name].headers["etag"] == golden[name].headers["etag"]
+    assert golden["Fizik"].json()[1]["completed"] is True
+
+
+async def test_encoded_body_follows_writes(api, monkeypatch):
+    monkeypatch.setattr(server, "FAST_TOPICS", True)
+    first = await api.get("/api/subjects/Kimya/topics")
+    topic_id = first.json()[0]["id"]
+
+    await api.put(f"/api/subjects/Kimya/topics/{topic_id}", json={"completed": True})
+    second = await api.get("/api/subjects/Kimya/topics")
+
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()[0]["completed"] is True
+    assert server.subject_cache.get_encoded("Kimya") == second.content
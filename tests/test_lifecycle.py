@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from cache import SubjectCache
+from storage import MemoryStorage, MotorStorage
+from tests.conftest import BACKEND_DIR
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    """Restore the connection globals that connect() and the lifespan replace"""
+    for name in ("client", "db", "timeline", "storage", "ready", "rollup_task", "write_behind_task"):
+        monkeypatch.setattr(server, name, getattr(server, name))
+    monkeypatch.setattr(server, "subject_cache", SubjectCache())
+
+
+async def get(path):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get(path)
+
+
+def test_import_does_not_need_mongo_url():
+    # An empty value keeps load_dotenv from filling it in from backend/.env
+    env = dict(os.environ, MONGO_URL="", STORAGE_BACKEND="memory")
+    result = subprocess.run([sys.executable, "-c", "import server; assert server.client is None"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_connect_requires_mongo_url_only_for_mongo(isolated, monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "")
+    monkeypatch.setenv("STORAGE_BACKEND", "mongo")
+    with pytest.raises(RuntimeError):
+        server.connect()
+
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    server.connect()
+    assert server.client is None and isinstance(server.storage, MemoryStorage)
+
+
+def test_client_uses_pool_settings(isolated, monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "mongodb://127.0.0.1:1")
+    monkeypatch.setenv("STORAGE_BACKEND", "mongo")
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+    server.connect()
+    try:
+        options = server.client.delegate.options
+        assert options.pool_options.max_pool_size == 7
+        assert options.read_preference.mongos_mode == "primaryPreferred"
+        assert isinstance(server.storage, MotorStorage)
+    finally:
+        server.client.close()
+
+
+async def test_lifespan_warms_up_before_ready(isolated, monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "")
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    assert (await get("/api/health/ready")).status_code == 503
+
+    async with server.lifespan(server.app):
+        assert server.subject_cache.stats()["subjects"] == len(server.CURRICULUM_DATA)
+        ready = await get("/api/health/ready")
+        assert ready.status_code == 200 and ready.json() == {"status": "ready", "storage": "memory"}
+        assert (await get("/api/health/live")).json() == {"status": "alive"}
+
+    assert (await get("/api/health/ready")).status_code == 503
+    assert (await get("/api/health/live")).status_code == 200
+
+
+async def test_readiness_fails_when_mongo_is_unreachable(isolated, monkeypatch):
+    client = AsyncIOMotorClient("mongodb://127.0.0.1:1", serverSelectionTimeoutMS=100)
+    monkeypatch.setattr(server, "db", client["unreachable"])
+    monkeypatch.setattr(server, "storage", MotorStorage(server.db, list(server.CURRICULUM_DATA)))
+    monkeypatch.setattr(server, "ready", True)
+
+    response = await get("/api/health/ready")
+
+    assert response.status_code == 503
+    assert "MongoDB unavailable" in response.json()["detail"]
+    client.close()
+
+
+async def test_readiness_pings_mongo(isolated, db, monkeypatch):
+    monkeypatch.setattr(server, "ready", True)
+    response = await get("/api/health/ready")
+    assert response.json() == {"status": "ready", "storage": "mongo", "mongo": "ok"}
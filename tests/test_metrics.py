@@ -0,0 +1,45 @@
+import httpx
+import pytest
+
+import server
+from metrics import Histogram, LATENCY_BUCKETS, Metrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(LATENCY_BUCKETS)
+    for _ in range(90):
+        histogram.observe(0.003)
+    for _ in range(10):
+        histogram.observe(0.2)
+
+    assert 0.0025 <= histogram.quantile(0.5) <= 0.005
+    assert 0.1 <= histogram.quantile(0.95) <= 0.25
+    assert histogram.quantile(0.99) <= 0.25
+
+
+def test_render_prometheus_text():
+    metrics = Metrics()
+    metrics.observe_request("GET", "/api/subjects", 200, 0.004, 900)
+    metrics.observe_mongo("subjects", "aggregate", 0.002)
+    metrics.observe_mongo("subjects", "update", 0.003, failed=True)
+
+    text = metrics.render()
+    assert 'http_requests_total{method="GET",route="/api/subjects",status="200"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/subjects",le="0.005"} 1' in text
+    assert 'http_response_size_bytes_count{method="GET",route="/api/subjects"} 1' in text
+    assert 'mongo_command_duration_seconds_count{collection="subjects",command="aggregate"} 1' in text
+    assert 'mongo_command_failures_total{collection="subjects",command="update"} 1' in text
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_labels_routes_by_template():
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        await http.get("/api/")
+        await http.get("/api/does-not-exist")
+        response = await http.get("/api/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/api/",status="200"}' in response.text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in response.text
+    assert 'http_request_duration_seconds_quantile{method="GET",route="/api/",quantile="0.99"}' in response.text
@@ -0,0 +1,86 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import server
+from planner import StudyPlanner, week_labels
+
+SUBJECTS = {"Fizik": [0, 1, 2, 3, 4, 5], "Kimya": [3, 2, 1, 0], "Biyoloji": [0, 1, 2, 7, 8]}
+
+
+def reference_plan(subjects, completed_rows, weeks):
+    """Per-student loop with the same rules as StudyPlanner.assign"""
+    plans = []
+    for completed in completed_rows:
+        keys, column = [], 0
+        for indexes in subjects.values():
+            remaining = [c for c in range(column, column + len(indexes)) if not completed[c]]
+            keys += [((rank + 0.5) / len(remaining), c) for rank, c in enumerate(remaining)]
+            column += len(indexes)
+        plan = [-1] * column
+        for position, (_, c) in enumerate(sorted(keys)):
+            plan[c] = position * weeks // len(keys)
+        plans.append(plan)
+    return np.array(plans)
+
+
+def test_week_labels_span_iso_weeks():
+    assert week_labels(date(2025, 12, 25), date(2026, 1, 20)) == [
+        "2025-W52", "2026-W01", "2026-W02", "2026-W03", "2026-W04"
+    ]
+    assert week_labels(date(2025, 3, 5), date(2025, 3, 6)) == ["2025-W10"]
+
+
+def test_completion_matrix_reads_bits_by_topic_index():
+    planner = StudyPlanner(SUBJECTS)
+    matrix = planner.completion_matrix({"Kimya": np.array([0b1000, 0]), "Biyoloji": np.array([1 << 8, 0])})
+
+    assert matrix.shape == (2, 15)
+    assert matrix[0].nonzero()[0].tolist() == [6, 14]
+    assert not matrix[1].any()
+
+
+@pytest.mark.parametrize("weeks", [1, 3, 7, 40])
+def test_vectorized_plan_matches_per_student_loop(weeks):
+    planner = StudyPlanner(SUBJECTS)
+    completed = np.random.default_rng(weeks).random((200, planner.columns)) < 0.4
+
+    assert (planner.assign(completed, weeks) == reference_plan(SUBJECTS, completed, weeks)).all()
+
+
+def test_plan_is_balanced_and_keeps_curriculum_order():
+    planner = StudyPlanner(SUBJECTS)
+    plan = planner.assign(np.zeros((1, planner.columns), dtype=bool), 5)[0]
+
+    assert np.bincount(plan).tolist() == [3, 3, 3, 3, 3]
+    for start, end in zip(planner.offsets[:-1], planner.offsets[1:]):
+        assert (np.diff(plan[start:end]) >= 0).all()
+    assert (planner.assign(np.ones((2, planner.columns), dtype=bool), 5) == -1).all()
+
+
+@pytest.mark.anyio
+async def test_plans_endpoint_populates_topic_weeks(api, db):
+    topics = (await api.get("/api/subjects/Fizik/topics")).json()
+    await db.progress.insert_one({"user_id": "ali", "subject": "Fizik", "bits": 0b11, "rev": 1})
+    await db.class_members.insert_many([{"user_id": "ali", "class_id": "12-A"},
+                                        {"user_id": "ayse", "class_id": "12-A"}])
+
+    response = await api.post("/api/plans", json={"class_id": "12-A", "start_date": "2026-01-05",
+                                                  "exam_date": "2026-02-27"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["students"] == 2 and len(body["weeks"]) == 8
+    assert body["planned_topics"] == 2 * sum(len(titles) for titles in server.CURRICULUM_DATA.values()) - 2
+
+    planned = (await api.get("/api/subjects/Fizik/topics", params={"user_id": "ali"})).json()
+    assert [topic["week"] for topic in planned[:2]] == [None, None]
+    assert all(topic["week"] in body["weeks"] for topic in planned[2:])
+    first_week = (await api.get("/api/subjects/Fizik/topics",
+                                params={"user_id": "ali", "week": body["weeks"][0]})).json()
+    assert first_week and topics[2]["id"] == first_week[0]["id"]
+
+    plan = (await api.get("/api/plans/ayse")).json()
+    assert [week["week"] for week in plan["weeks"]] == body["weeks"]
+    assert (await api.get("/api/plans/nobody")).status_code == 404
+    assert (await api.post("/api/plans", json={"class_id": "yok", "exam_date": "2099-01-01"})).status_code == 404
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+import server
+from events import ProgressHub
+
+
+@pytest.mark.anyio
+async def test_events_fan_out_by_subject():
+    hub = ProgressHub()
+    everything = hub.subscribe()
+    fizik = hub.subscribe("Fizik")
+
+    hub.publish({"subject": "Kimya", "topic_id": "a"})
+    hub.publish({"subject": "Fizik", "topic_id": "b"})
+
+    assert (await everything.get())["topic_id"] == "a"
+    assert (await everything.get())["topic_id"] == "b"
+    assert (await fizik.get())["topic_id"] == "b"
+    assert fizik.queue.empty()
+
+
+@pytest.mark.anyio
+async def test_slow_consumer_is_dropped_without_blocking_others():
+    hub = ProgressHub(queue_size=2)
+    slow = hub.subscribe()
+    fast = hub.subscribe()
+
+    for number in range(3):
+        hub.publish({"subject": "Fizik", "topic_id": str(number)})
+        await fast.get()
+
+    assert slow.dropped and not fast.dropped
+    assert await slow.get() is None
+    assert hub.stats() == {"subscribers": 1, "published": 3, "dropped": 1, "queue_size": 2}
+
+
+@pytest.mark.anyio
+async def test_thousands_of_idle_subscribers():
+    hub = ProgressHub()
+    subscriptions = [hub.subscribe() for _ in range(5000)]
+    waiters = [asyncio.ensure_future(subscription.get()) for subscription in subscriptions]
+    await asyncio.sleep(0)
+
+    hub.publish({"subject": "Fizik", "topic_id": "a", "revision": 1})
+
+    events = await asyncio.gather(*waiters)
+    assert all(event["revision"] == 1 for event in events)
+
+
+def test_idle_websocket_client_is_unsubscribed_on_disconnect(monkeypatch):
+    hub = ProgressHub()
+    monkeypatch.setattr(server, "progress_hub", hub)
+    client = TestClient(server.app)
+
+    with client.websocket_connect("/api/ws/progress?subject=Fizik") as websocket:
+        websocket.send_text("ignored")
+        # Publish on the app's event loop; receiving the event proves the subscription is live
+        websocket.portal.call(hub.publish, {"subject": "Fizik", "topic_id": "a"})
+        assert websocket.receive_json() == {"subject": "Fizik", "topic_id": "a"}
+        assert hub.stats()["subscribers"] == 1
+    # No further event for Fizik ever comes; the close alone must end the subscription
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_websocket_errors_are_logged(monkeypatch, caplog):
+    hub = ProgressHub()
+    monkeypatch.setattr(server, "progress_hub", hub)
+    client = TestClient(server.app)
+
+    with client.websocket_connect("/api/ws/progress") as websocket:
+        websocket.send_text("ignored")
+        # An event the socket cannot encode is a server bug, not a client going away
+        websocket.portal.call(hub.publish, {"subject": "Fizik", "topic_id": object()})
+        assert websocket.receive()["code"] == 1011
+    assert "Progress WebSocket failed" in caplog.text
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_several_workers_need_live_events_off(monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("MONGO_URL", "")
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.setattr(server, "storage", None)
+
+    with pytest.raises(RuntimeError, match="single worker"):
+        server.connect()
+    monkeypatch.setattr(server, "PROGRESS_EVENTS", False)
+    server.connect()
+    assert server.storage.name == "memory"
+    assert TestClient(server.app).get("/api/events").status_code == 501
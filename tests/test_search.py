@@ -0,0 +1,78 @@
+import httpx
+import pytest
+
+import server
+from cache import SubjectCache
+from search import SearchIndex, fold
+from storage import MemoryStorage
+
+CURRICULUM = {
+    "Fizik": ["Işık ve Gölge", "Elektriksel Kuvvet", "Manyetik Kuvvet", "Kuvvet"],
+    "Türkçe": ["Şiir Bilgisi", "İsim Tamlamaları", "Ünlü Düşmesi"]
+}
+
+
+@pytest.mark.parametrize("text,folded", [
+    ("IŞIK", "isik"),
+    ("İstanbul", "istanbul"),
+    ("ÇAĞDAŞ Öykü", "cagdas oyku"),
+    ("Ünlü Düşmesi", "unlu dusmesi")
+])
+def test_turkish_folding(text, folded):
+    assert fold(text) == folded
+
+
+def test_matches_regardless_of_case_and_diacritics():
+    index = SearchIndex(CURRICULUM)
+
+    for query in ["ışık", "ISIK", "isik", "IŞIK GÖLGE"]:
+        assert [hit["title"] for hit in index.search(query)] == ["Işık ve Gölge"]
+    assert [hit["title"] for hit in index.search("İSİM")] == ["İsim Tamlamaları"]
+    assert [hit["title"] for hit in index.search("siir bilg")] == ["Şiir Bilgisi"]
+    assert index.search("kuvvet yok") == []
+    assert index.search("  ") == []
+
+
+def test_ranking_prefers_exact_and_leading_matches():
+    index = SearchIndex(CURRICULUM)
+
+    titles = [hit["title"] for hit in index.search("kuvvet")]
+    assert titles[0] == "Kuvvet"
+    assert set(titles) == {"Kuvvet", "Elektriksel Kuvvet", "Manyetik Kuvvet"}
+    hits = index.search("fi")
+    assert hits[0] == {"type": "subject", "subject": "Fizik", "title": "Fizik", "score": hits[0]["score"]}
+
+
+def test_query_only_scores_documents_in_every_prefix_bucket(monkeypatch):
+    index = SearchIndex(server.CURRICULUM_DATA)
+    scored = []
+    score = index._score
+    monkeypatch.setattr(index, "_score", lambda doc_id, *args: scored.append(doc_id) or score(doc_id, *args))
+
+    hits = index.search("kimyasal t", 20)
+    expected = index._prefixes["kimyasal"] & index._prefixes["t"]
+    assert hits and sorted(scored) == sorted(expected)
+    assert len(scored) < index.stats()["documents"] / 10
+    scored.clear()
+    assert index.search("kimyasal zzz") == [] and scored == []
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_returns_completion_state(monkeypatch):
+    engine = MemoryStorage()
+    await engine.prepare(server.CURRICULUM_DATA)
+    monkeypatch.setattr(server, "storage", engine)
+    monkeypatch.setattr(server, "subject_cache", SubjectCache())
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+        topic = (await api.get("/api/subjects/Matematik/topics")).json()[0]
+        await api.put(f"/api/subjects/Matematik/topics/{topic['id']}", json={"completed": True})
+
+        response = await api.get("/api/search", params={"q": topic["title"].upper()})
+        assert response.status_code == 200
+        hit = response.json()["hits"][0]
+        assert (hit["type"], hit["id"], hit["completed"]) == ("topic", topic["id"], True)
+
+        subject = (await api.get("/api/search", params={"q": "matem"})).json()["hits"][0]
+        assert subject["type"] == "subject" and subject["completed_topics"] == 1
+        assert (await api.get("/api/search", params={"q": "x", "limit": 0})).status_code == 400
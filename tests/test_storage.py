@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+import server
+from storage import MemoryStorage, MotorStorage, SQLiteStorage, SubjectNotFound, TopicNotFound
+from tests.conftest import scratch_database
+
+pytestmark = pytest.mark.anyio
+
+CURRICULUM = server.CURRICULUM_DATA
+
+
+@pytest.fixture(params=["memory", "sqlite", "mongo"])
+async def storage(request, tmp_path, monkeypatch):
+    if request.param == "mongo":
+        async with scratch_database() as db:
+            # Mongo subjects are seeded by the server's startup migration, not the engine
+            monkeypatch.setattr(server, "db", db)
+            engine = MotorStorage(db, list(CURRICULUM.keys()))
+            monkeypatch.setattr(server, "storage", engine)
+            await server.seed_curriculum()
+            yield engine
+        return
+
+    engine = SQLiteStorage(str(tmp_path / "curriculum.db")) if request.param == "sqlite" else MemoryStorage()
+    await engine.prepare(CURRICULUM)
+    yield engine
+    await engine.close()
+
+
+async def test_summaries_cover_the_curriculum(storage):
+    summaries = {doc["name"]: doc for doc in await storage.subject_summaries()}
+
+    assert set(summaries) == set(CURRICULUM)
+    for name, titles in CURRICULUM.items():
+        assert summaries[name]["total_topics"] == len(titles)
+        assert summaries[name]["completed_topics"] == 0
+        assert len(summaries[name]["id"]) == 36
+
+
+async def test_prepare_is_idempotent(storage):
+    before = await storage.list_topics("Fizik")
+    await storage.prepare(CURRICULUM)
+
+    assert await storage.list_topics("Fizik") == before
+    assert len(await storage.subject_summaries()) == len(CURRICULUM)
+
+
+async def test_topics_keep_curriculum_order(storage):
+    topics = await storage.list_topics("Kimya")
+
+    assert [topic["title"] for topic in topics] == CURRICULUM["Kimya"]
+    assert [topic["idx"] for topic in topics] == list(range(len(topics)))
+    assert not any(topic["completed"] for topic in topics)
+    with pytest.raises(SubjectNotFound):
+        await storage.list_topics("Yok")
+
+
+async def test_set_topic_outcomes(storage):
+    topic_id = (await storage.list_topics("Türkçe"))[2]["id"]
+
+    updated = await storage.set_topic("Türkçe", topic_id, True)
+    assert updated["status"] == "updated" and updated["completed"] is True
+    again = await storage.set_topic("Türkçe", topic_id, True)
+    assert again == {"status": "unchanged", "revision": updated["revision"], "completed": True}
+
+    stale = await storage.set_topic("Türkçe", topic_id, False, base_rev=updated["revision"] - 1)
+    assert stale["status"] == "conflict" and stale["completed"] is True
+    fresh = await storage.set_topic("Türkçe", topic_id, False, base_rev=updated["revision"])
+    assert fresh["status"] == "updated" and fresh["revision"] > updated["revision"]
+
+    summary = next(doc for doc in await storage.subject_summaries() if doc["name"] == "Türkçe")
+    assert summary["completed_topics"] == 0
+
+    with pytest.raises(SubjectNotFound):
+        await storage.set_topic("Yok", topic_id, True)
+    with pytest.raises(TopicNotFound):
+        await storage.set_topic("Türkçe", "missing", True)
+
+
+async def test_revisions_are_monotonic(storage):
+    topic = (await storage.list_topics("Kimya"))[0]
+    revisions = [(await storage.set_topic("Kimya", topic["id"], completed))["revision"]
+                 for completed in (True, False, True)]
+
+    assert revisions == sorted(set(revisions))
+    assert revisions[0] > topic.get("rev", 0)
+
+
+async def test_subject_versions_move_with_every_write(storage):
+    before = await storage.subject_versions()
+    topic = (await storage.list_topics("Fizik"))[0]
+    await storage.set_topic("Fizik", topic["id"], True)
+    await storage.set_topic("Fizik", topic["id"], True)
+
+    after = await storage.subject_versions()
+    assert set(after) == set(CURRICULUM) and after["Fizik"] != before["Fizik"]
+    assert {name: version for name, version in after.items() if name != "Fizik"} == \
+        {name: version for name, version in before.items() if name != "Fizik"}
+    await storage.set_topic("Fizik", topic["id"], False)
+    assert (await storage.subject_versions())["Fizik"] not in (before["Fizik"], after["Fizik"])
+
+
+async def test_concurrent_toggles_are_not_lost(storage):
+    topics = await storage.list_topics("Fizik")
+
+    await asyncio.gather(*(storage.set_topic("Fizik", topic["id"], True) for topic in topics for _ in range(3)))
+
+    assert all(topic["completed"] for topic in await storage.list_topics("Fizik"))
+    summary = next(doc for doc in await storage.subject_summaries() if doc["name"] == "Fizik")
+    assert summary["completed_topics"] == len(topics)
+
+
+async def test_query_topics_filters_and_pages(storage):
+    topics = await storage.list_topics("Biyoloji")
+    done = [topics[1]["id"], topics[4]["id"], topics[5]["id"]]
+    for topic_id in done:
+        await storage.set_topic("Biyoloji", topic_id, True)
+
+    completed = await storage.query_topics("Biyoloji", completed=True)
+    assert [topic["id"] for topic in completed] == done
+    pending = await storage.query_topics("Biyoloji", completed=False, limit=3)
+    assert [topic["id"] for topic in pending] == [topics[0]["id"], topics[2]["id"], topics[3]["id"]]
+    after = await storage.query_topics("Biyoloji", completed=True, after=done[0], limit=1)
+    assert [topic["id"] for topic in after] == [done[1]]
+
+    assert await storage.query_topics("Biyoloji", after=topics[-1]["id"]) == []
+    assert await storage.query_topics("Biyoloji", week="2025-W01") == []
+    with pytest.raises(TopicNotFound):
+        await storage.query_topics("Biyoloji", after="missing")
+    with pytest.raises(SubjectNotFound):
+        await storage.query_topics("Yok", completed=True)
@@ -0,0 +1,173 @@
+import httpx
+import pytest
+
+import server
+from cache import SubjectCache
+from storage import SQLiteStorage
+
+
+def make_topics():
+    return [{"id": "a", "title": "A", "completed": False},
+            {"id": "b", "title": "B", "completed": True}]
+
+
+def test_write_through_updates_topics_and_summary():
+    cache = SubjectCache()
+    cache.set_topics("Fizik", 0, make_topics())
+    cache.set_summary("Fizik", 0, {"id": "s", "name": "Fizik", "total_topics": 2, "completed_topics": 1})
+    etag = cache.etag("Fizik")
+
+    cache.apply_topic_update("Fizik", "a", True)
+
+    assert cache.etag("Fizik") != etag
+    assert cache.get_topics("Fizik")[0]["completed"] is True
+    assert cache.get_summary("Fizik")["completed_topics"] == 2
+
+
+def test_stale_fill_is_discarded():
+    cache = SubjectCache()
+    revision = cache.revision("Fizik")
+    cache.apply_topic_update("Fizik", "a", True)
+
+    cache.set_topics("Fizik", revision, make_topics())
+
+    assert cache.get_topics("Fizik") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_summary_without_topics_is_dropped_on_write():
+    cache = SubjectCache()
+    cache.set_summary("Fizik", 0, {"id": "s", "name": "Fizik", "total_topics": 2, "completed_topics": 1})
+
+    cache.apply_topic_update("Fizik", "a", True)
+
+    assert cache.get_summary("Fizik") is None
+
+
+def test_lru_bound():
+    cache = SubjectCache(max_subjects=2)
+    for name in ["Fizik", "Kimya", "Biyoloji"]:
+        cache.set_topics(name, 0, make_topics())
+
+    assert cache.get_topics("Fizik") is None
+    assert cache.get_topics("Biyoloji") is not None
+    assert cache.stats()["subjects"] == 2
+
+
+def test_observing_a_new_stored_version_invalidates():
+    cache = SubjectCache()
+    cache.observe("Fizik", 3)
+    cache.set_topics("Fizik", cache.revision("Fizik"), make_topics())
+    etag, summary_etag = cache.etag("Fizik"), cache.summary_etag()
+
+    cache.observe("Fizik", 3)
+    assert cache.get_topics("Fizik") is not None
+    cache.observe("Fizik", 4)
+    assert cache.get_topics("Fizik") is None
+    assert cache.etag("Fizik") != etag and cache.summary_etag() != summary_etag
+
+
+def test_own_writes_keep_the_cache_unless_another_write_came_first():
+    cache = SubjectCache()
+    cache.observe("Fizik", 3)
+    cache.set_topics("Fizik", cache.revision("Fizik"), make_topics())
+
+    cache.apply_topic_update("Fizik", "a", True)
+    cache.observe_write("Fizik", 3, 5)
+    cache.observe("Fizik", 5)
+    assert cache.get_topics("Fizik")[0]["completed"] is True
+
+    # Version 6 came from elsewhere, so the cache cannot vouch for what this write stored over it
+    cache.apply_topic_update("Fizik", "b", True)
+    cache.observe_write("Fizik", 6, 7)
+    assert cache.get_topics("Fizik") is None
+
+
+@pytest.mark.anyio
+async def test_workers_see_each_others_writes(tmp_path, monkeypatch):
+    # Two worker processes, each with its own engine and cache on one SQLite file
+    workers = []
+    for _ in range(2):
+        engine = SQLiteStorage(str(tmp_path / "curriculum.db"))
+        await engine.prepare(server.CURRICULUM_DATA)
+        workers.append((engine, SubjectCache()))
+
+    async def get(worker, path, **kwargs):
+        monkeypatch.setattr(server, "storage", worker[0])
+        monkeypatch.setattr(server, "subject_cache", worker[1])
+        return await api.get(path, **kwargs)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+        first = await get(workers[0], "/api/subjects/Fizik/topics")
+        summary = await get(workers[0], "/api/subjects")
+        assert (await get(workers[0], "/api/subjects/Fizik/topics",
+                          headers={"If-None-Match": first.headers["etag"]})).status_code == 304
+
+        monkeypatch.setattr(server, "storage", workers[1][0])
+        monkeypatch.setattr(server, "subject_cache", workers[1][1])
+        await api.put(f"/api/subjects/Fizik/topics/{first.json()[0]['id']}", json={"completed": True})
+        # The first worker's next revalidation tick
+        monkeypatch.setattr(server, "storage", workers[0][0])
+        monkeypatch.setattr(server, "subject_cache", workers[0][1])
+        await server._revalidate_cache()
+
+        fresh = await get(workers[0], "/api/subjects/Fizik/topics", headers={"If-None-Match": first.headers["etag"]})
+        assert fresh.status_code == 200 and fresh.json()[0]["completed"] is True
+        subjects = await get(workers[0], "/api/subjects", headers={"If-None-Match": summary.headers["etag"]})
+        assert next(s for s in subjects.json() if s["name"] == "Fizik")["completed_topics"] == 1
+    for engine, _ in workers:
+        await engine.close()
+
+
+@pytest.mark.anyio
+async def test_cached_topics_pick_up_writes_from_other_workers(api):
+    first = await api.get("/api/subjects/Kimya/topics")
+    # Written by another worker: this process's cache only hears of it on its next revalidation
+    await server.storage.set_topic("Kimya", first.json()[0]["id"], True)
+    await server._revalidate_cache()
+
+    fresh = await api.get("/api/subjects/Kimya/topics", headers={"If-None-Match": first.headers["etag"]})
+    assert fresh.status_code == 200 and fresh.json()[0]["completed"] is True
+
+
+@pytest.mark.anyio
+async def test_etag_revalidation(api):
+    first = await api.get("/api/subjects/Kimya/topics")
+    etag = first.headers["etag"]
+
+    cached = await api.get("/api/subjects/Kimya/topics", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    topic_id = first.json()[0]["id"]
+    await api.put(f"/api/subjects/Kimya/topics/{topic_id}", json={"completed": True})
+
+    fresh = await api.get("/api/subjects/Kimya/topics", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["completed"] is True
+
+    summary = await api.get("/api/subjects")
+    assert (await api.get("/api/subjects", headers={"If-None-Match": summary.headers["etag"]})).status_code == 304
+    stats = (await api.get("/api/cache/stats")).json()
+    assert stats["hits"] >= 1
+
+
+@pytest.mark.anyio
+async def test_requests_do_not_wait_on_revalidation(api, monkeypatch):
+    first = await api.get("/api/subjects/Kimya/topics")
+
+    async def no_round_trip():
+        raise AssertionError("revalidation ran in a request")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(server.storage, "subject_versions", no_round_trip)
+        assert (await api.get("/api/subjects/Kimya/topics",
+                              headers={"If-None-Match": first.headers["etag"]})).status_code == 304
+        await api.put(f"/api/subjects/Kimya/topics/{first.json()[0]['id']}", json={"completed": True})
+        assert (await api.get("/api/search", params={"q": "Kimya"})).status_code == 200
+
+    # This process's own write does not cost it the cache on the next tick
+    misses = server.subject_cache.misses
+    await server._revalidate_cache()
+    assert (await api.get("/api/subjects/Kimya/topics")).json()[0]["completed"] is True
+    assert server.subject_cache.misses == misses
@@ -0,0 +1,95 @@
+import pytest
+
+import server
+from storage import REVISION_SCALE
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_delta_sync_returns_changed_topics(api):
+    topics = (await api.get("/api/subjects/Biyoloji/topics")).json()
+    await api.put(f"/api/subjects/Biyoloji/topics/{topics[0]['id']}", json={"completed": True})
+
+    snapshot = (await api.get("/api/sync")).json()
+    assert len(snapshot["topics"]) == 43 + 58 + 33 + 34 + 28
+    since = snapshot["revision"]
+    assert since > 0
+
+    toggled = await api.put(f"/api/subjects/Biyoloji/topics/{topics[3]['id']}", json={"completed": True})
+    revision = toggled.json()["revision"]
+    assert revision >= since
+
+    delta = (await api.get(f"/api/sync?since={since}")).json()
+    assert delta["revision"] >= revision
+    assert (topics[3]["id"], True, revision) in [(t["id"], t["completed"], t["rev"]) for t in delta["topics"]]
+    # Only topics touched within the overlap window before `since` come back
+    assert {t["id"] for t in delta["topics"]} <= {topics[0]["id"], topics[3]["id"]}
+    assert all(t["rev"] > since - server.SYNC_OVERLAP_MS * REVISION_SCALE for t in delta["topics"])
+
+
+async def test_late_commit_below_the_cursor_is_resent(api, monkeypatch):
+    topics = (await api.get("/api/subjects/Fizik/topics")).json()
+    since = (await api.get("/api/sync")).json()["revision"]
+    # A write stamped just before the client synced, committed just after
+    await server.db.subjects.update_one(
+        {"name": "Fizik", "topics.id": topics[0]["id"]},
+        {"$set": {"topics.$.completed": True, "topics.$.rev": since - 1}, "$max": {"rev": since - 1}}
+    )
+
+    delta = (await api.get(f"/api/sync?since={since}")).json()
+    assert [t["id"] for t in delta["topics"]] == [topics[0]["id"]]
+
+    monkeypatch.setattr(server, "SYNC_OVERLAP_MS", 0)
+    assert (await api.get(f"/api/sync?since={since}")).json()["topics"] == []
+
+
+async def test_offline_changes_with_revision_checks(api):
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+    base = (await api.get("/api/sync")).json()["revision"]
+
+    # Someone else changes topic 0 after the client went offline
+    await api.put(f"/api/subjects/Kimya/topics/{topics[0]['id']}", json={"completed": True})
+
+    response = await api.post("/api/sync", json={"changes": [
+        {"subject": "Kimya", "topic_id": topics[0]["id"], "completed": False, "base_rev": base},
+        {"subject": "Kimya", "topic_id": topics[1]["id"], "completed": True, "base_rev": base},
+        {"subject": "Kimya", "topic_id": topics[2]["id"], "completed": True},
+        {"subject": "Kimya", "topic_id": "missing", "completed": True},
+    ]})
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["conflict", "updated", "updated", "not_found"]
+    assert results[0]["completed"] is True
+
+    # Last writer wins when no base revision is sent
+    response = await api.post("/api/sync", json={"changes": [
+        {"subject": "Kimya", "topic_id": topics[0]["id"], "completed": False},
+    ]})
+    assert response.json()["results"][0]["status"] == "updated"
+
+
+async def test_repeated_user_toggle_is_not_a_change(api, monkeypatch):
+    # Without the overlap window the delta only holds writes that moved a revision
+    monkeypatch.setattr(server, "SYNC_OVERLAP_MS", 0)
+    topic_id = (await api.get("/api/subjects/Kimya/topics")).json()[0]["id"]
+    url = f"/api/subjects/Kimya/topics/{topic_id}?user_id=ayse"
+    first = (await api.put(url, json={"completed": True})).json()
+    since = (await api.get("/api/sync?user_id=ayse")).json()["revision"]
+
+    repeated = (await api.put(url, json={"completed": True})).json()
+
+    assert repeated["modified_count"] == 0 and repeated["revision"] == first["revision"]
+    assert (await api.get(f"/api/sync?since={since}&user_id=ayse")).json()["topics"] == []
+
+
+async def test_user_delta_sync(api):
+    kimya = (await api.get("/api/subjects/Kimya/topics")).json()
+    await api.put(f"/api/subjects/Kimya/topics/{kimya[0]['id']}?user_id=ayse", json={"completed": True})
+    since = (await api.get("/api/sync?user_id=ayse")).json()["revision"]
+
+    topics = (await api.get("/api/subjects/Fizik/topics")).json()
+    await api.put(f"/api/subjects/Fizik/topics/{topics[0]['id']}?user_id=ayse", json={"completed": True})
+
+    delta = (await api.get(f"/api/sync?since={since}&user_id=ayse")).json()
+    fizik = [t for t in delta["topics"] if t["subject"] == "Fizik"]
+    assert [t["id"] for t in fizik if t["completed"]] == [topics[0]["id"]]
+    assert {t["subject"] for t in delta["topics"]} <= {"Fizik", "Kimya"}
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from pymongo import UpdateOne
+
+import server
+from timeline import RebuildInProgress, Timeline, topic_event
+
+ISTANBUL = ZoneInfo("Europe/Istanbul")
+
+
+def test_buckets_use_the_configured_timezone():
+    timeline = Timeline(None, ISTANBUL)
+    # 22:30 UTC on Sunday is already Monday in Istanbul
+    at = datetime(2025, 1, 5, 22, 30, tzinfo=timezone.utc)
+
+    assert timeline.bucket(at, "day") == "2025-01-06"
+    assert timeline.bucket(at, "week") == "2025-W02"
+    assert timeline.bucket(at.replace(tzinfo=None), "week") == "2025-W02"
+    assert Timeline(None, timezone.utc).bucket(at, "week") == "2025-W01"
+
+
+@pytest.mark.anyio
+async def test_rollup_counts_each_event_once(db):
+    timeline = Timeline(db, ISTANBUL, batch_size=7)
+    await timeline.prepare()
+    monday = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    events = []
+    for day in range(10):
+        for completed in (True, True, False):
+            event = topic_event("Fizik", f"t{day}", completed, day)
+            event["at"] = monday + timedelta(days=day)
+            events.append(event)
+    user_event = topic_event("Kimya", "k1", True, 99, user_id="u1")
+    user_event["at"] = monday
+    await timeline.record(events + [user_event])
+
+    assert await timeline.rollup() == 31
+    assert await timeline.rollup() == 0
+
+    weeks = await timeline.read("week", "2025-W01", "2025-W53")
+    assert weeks == [
+        {"bucket": "2025-W02", "completed": 14, "uncompleted": 7, "net": 7},
+        {"bucket": "2025-W03", "completed": 6, "uncompleted": 3, "net": 3}
+    ]
+    days = await timeline.read("day", "2025-01-06", "2025-01-07", subject="Fizik")
+    assert [day["completed"] for day in days] == [2, 2]
+    assert await timeline.read("week", "2025-W01", "2025-W53", user_id="u1") == [
+        {"bucket": "2025-W02", "completed": 1, "uncompleted": 0, "net": 1}
+    ]
+
+
+async def _week_totals(timeline):
+    return [(week["completed"], week["uncompleted"]) for week in await timeline.read("week", "2025-W01", "2025-W53")]
+
+
+@pytest.mark.anyio
+async def test_taking_over_a_stale_claim_does_not_double_count(db):
+    timeline = Timeline(db, ISTANBUL, claim_timeout=60)
+    await timeline.prepare()
+    monday = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    events = []
+    for day in range(10):
+        event = topic_event("Fizik", f"t{day}", day % 3 != 0, day)
+        event["at"] = monday + timedelta(days=day)
+        events.append(event)
+    await timeline.record(events)
+
+    # A worker reaches some of its buckets, then stalls past the claim timeout
+    token, claimed = await timeline._claim()
+    increments = list(timeline._increments(claimed).items())
+    stalled = [UpdateOne(dict(zip(("period", "user_id", "bucket", "subject"), key)), timeline._apply(counts, token),
+                         upsert=True) for key, counts in increments]
+    await db.progress_buckets.bulk_write(stalled[:3])
+    await db.topic_events.update_many({"rollup_token": token},
+                                      {"$set": {"claimed_at": datetime.now(timezone.utc) - timedelta(minutes=5)}})
+
+    assert await timeline.rollup() == 10
+    assert await _week_totals(timeline) == [(4, 3), (2, 1)]
+    # The stalled worker wakes up and finishes its batch
+    await db.progress_buckets.bulk_write(stalled)
+    assert await _week_totals(timeline) == [(4, 3), (2, 1)]
+
+
+@pytest.mark.anyio
+async def test_rollups_yield_to_a_rebuild(db):
+    timeline = Timeline(db, ISTANBUL)
+    await timeline.prepare()
+    event = topic_event("Fizik", "t1", True, 1)
+    event["at"] = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    await timeline.record([event])
+    until = datetime.now(timezone.utc) + timedelta(minutes=1)
+    await db.timeline_locks.insert_one({"_id": "rebuild", "until": until, "token": "other"})
+
+    assert await timeline.rollup() == 0
+    with pytest.raises(RebuildInProgress):
+        await timeline.rebuild()
+    # The handed back claim neither holds the rebuild off nor gets lost
+    await db.timeline_locks.delete_one({"_id": "rebuild"})
+    assert await timeline.rebuild() == {"buckets": 2}
+    assert await _week_totals(timeline) == [(1, 0)]
+    assert await timeline.rollup() == 0
+    assert await db.timeline_locks.count_documents({}) == 0
+
+
+@pytest.mark.anyio
+async def test_toggles_reach_the_timeline_endpoint(api):
+    topics = (await api.get("/api/subjects/Biyoloji/topics")).json()
+    await api.put(f"/api/subjects/Biyoloji/topics/{topics[0]['id']}", json={"completed": True})
+    await api.put(f"/api/subjects/Biyoloji/topics/{topics[0]['id']}", json={"completed": True})
+    await api.put(f"/api/subjects/Biyoloji/topics/{topics[0]['id']}", json={"completed": False})
+    await api.put("/api/topics/bulk", json={"updates": [
+        {"subject": "Biyoloji", "topic_id": topic["id"], "completed": True} for topic in topics[1:4]
+    ]})
+
+    assert (await api.post("/api/timeline/rollup")).json() == {"events": 5}
+    response = await api.get("/api/timeline", params={"period": "day", "subject": "Biyoloji"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["timezone"] == str(server.TIMELINE_TZ)
+    assert [(b["completed"], b["uncompleted"]) for b in body["buckets"]] == [(4, 1)]
+
+    rebuilt = await api.post("/api/timeline/rebuild")
+    assert rebuilt.json() == {"buckets": 2}
+    assert (await api.get("/api/timeline", params={"period": "day"})).json()["buckets"] == body["buckets"]
+    assert (await api.get("/api/timeline", params={"period": "month"})).status_code == 400
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+SUBJECT = "Fizik"
+
+
+async def test_parallel_toggles_are_not_lost(api):
+    topics = (await api.get(f"/api/subjects/{SUBJECT}/topics")).json()
+    assert len(topics) == len(server.CURRICULUM_DATA[SUBJECT])
+
+    # Five requests per topic, all in flight at once against the same subject document
+    requests = [
+        api.put(f"/api/subjects/{SUBJECT}/topics/{topic['id']}", json={"completed": True})
+        for _ in range(5)
+        for topic in topics
+    ]
+    responses = await asyncio.gather(*requests)
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["matched_count"] == 1 for r in responses)
+
+    topics = (await api.get(f"/api/subjects/{SUBJECT}/topics")).json()
+    assert all(topic["completed"] for topic in topics)
+
+    summary = next(s for s in (await api.get("/api/subjects")).json() if s["name"] == SUBJECT)
+    assert summary["completed_topics"] == summary["total_topics"]
+
+
+async def test_toggle_unknown_subject_or_topic(api):
+    response = await api.put("/api/subjects/Yok/topics/x", json={"completed": True})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Subject not found"
+
+    response = await api.put(f"/api/subjects/{SUBJECT}/topics/x", json={"completed": True})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Topic not found"
@@ -0,0 +1,111 @@
+import httpx
+import pytest
+
+import server
+from cache import SubjectCache
+from storage import MemoryStorage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    engine = MemoryStorage()
+    await engine.prepare(server.CURRICULUM_DATA)
+    monkeypatch.setattr(server, "storage", engine)
+    monkeypatch.setattr(server, "subject_cache", SubjectCache())
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+
+async def complete(api, subject, positions):
+    topics = (await api.get(f"/api/subjects/{subject}/topics")).json()
+    for position in positions:
+        await api.put(f"/api/subjects/{subject}/topics/{topics[position]['id']}", json={"completed": True})
+    return topics
+
+
+@pytest.mark.parametrize("cached", [True, False])
+async def test_status_filter(api, cached):
+    topics = await complete(api, "Kimya", [0, 3])
+    if not cached:
+        server.subject_cache.invalidate("Kimya")
+
+    completed = (await api.get("/api/subjects/Kimya/topics", params={"status": "completed"})).json()
+    pending = (await api.get("/api/subjects/Kimya/topics", params={"status": "pending"})).json()
+
+    assert [topic["id"] for topic in completed] == [topics[0]["id"], topics[3]["id"]]
+    assert len(pending) == len(topics) - 2
+    assert set(completed[0]) == {"id", "title", "completed", "week"}
+
+
+@pytest.mark.parametrize("fast", [False, True])
+async def test_cursor_pagination_walks_every_topic(api, monkeypatch, fast):
+    monkeypatch.setattr(server, "FAST_TOPICS", fast)
+    everything = (await api.get("/api/subjects/Fizik/topics")).json()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 7} if cursor is None else {"limit": 7, "cursor": cursor}
+        response = await api.get("/api/subjects/Fizik/topics", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 7
+        seen += page
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert seen == everything
+
+
+async def test_filtered_etag_is_per_query_and_revision(api):
+    url = "/api/subjects/Matematik/topics"
+    first = await api.get(url, params={"status": "pending"})
+    unfiltered = await api.get(url)
+    assert first.headers["etag"] != unfiltered.headers["etag"]
+
+    again = await api.get(url, params={"status": "pending"}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+    await complete(api, "Matematik", [0])
+    changed = await api.get(url, params={"status": "pending"}, headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert len(changed.json()) == len(first.json()) - 1
+
+
+async def test_invalid_parameters(api):
+    assert (await api.get("/api/subjects/Fizik/topics", params={"status": "done"})).status_code == 400
+    assert (await api.get("/api/subjects/Fizik/topics", params={"limit": 0})).status_code == 400
+    assert (await api.get("/api/subjects/Fizik/topics", params={"cursor": "missing"})).status_code == 400
+    assert (await api.get("/api/subjects/Yok/topics", params={"status": "pending"})).status_code == 404
+
+
+async def test_cache_miss_is_filtered_in_mongo(db, monkeypatch):
+    calls = []
+    query_topics = server.storage.query_topics
+
+    async def counted(*args):
+        calls.append(args)
+        return await query_topics(*args)
+
+    monkeypatch.setattr(server.storage, "query_topics", counted)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        url = "/api/subjects/Biyoloji/topics"
+        topics = (await http.get(url)).json()
+        # Written by another worker; the next revalidation drops this process's copy
+        for position in (2, 5):
+            await server.storage.set_topic("Biyoloji", topics[position]["id"], True)
+        await server._revalidate_cache()
+
+        completed = (await http.get(url, params={"status": "completed"})).json()
+        page = await http.get(url, params={"status": "pending", "limit": 2, "cursor": topics[2]["id"]})
+
+    assert [topic["id"] for topic in completed] == [topics[2]["id"], topics[5]["id"]]
+    assert [topic["id"] for topic in page.json()] == [topics[3]["id"], topics[4]["id"]]
+    assert page.headers["x-next-cursor"] == topics[4]["id"]
+    # Both pages came from the aggregation; filtered reads do not pull the whole list back in
+    assert len(calls) == 2
+    assert server.subject_cache.get_topics("Biyoloji") is None
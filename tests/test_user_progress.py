@@ -0,0 +1,45 @@
+import pytest
+
+import server
+
+
+def test_count_completed_ignores_unknown_bits(monkeypatch):
+    monkeypatch.setitem(server.topic_index, "Fizik", {"a": 0, "b": 1, "c": 5})
+
+    assert server._count_completed("Fizik", 0b100011) == 3
+    assert server._count_completed("Fizik", 0b11100) == 0
+    assert server._count_completed("Yok", 0b1) == 0
+
+
+@pytest.mark.anyio
+async def test_progress_is_scoped_per_user(api):
+    topics = (await api.get("/api/subjects/Matematik/topics")).json()
+    first, last = topics[0]["id"], topics[-1]["id"]
+
+    for topic_id in (first, last):
+        response = await api.put(f"/api/subjects/Matematik/topics/{topic_id}?user_id=ayse",
+                                 json={"completed": True})
+        assert response.status_code == 200
+    await api.put(f"/api/subjects/Matematik/topics/{first}?user_id=ayse", json={"completed": False})
+    await api.put(f"/api/subjects/Matematik/topics/{first}?user_id=mehmet", json={"completed": True})
+
+    ayse = (await api.get("/api/subjects/Matematik/topics?user_id=ayse")).json()
+    assert [t["id"] for t in ayse if t["completed"]] == [last]
+    mehmet = (await api.get("/api/subjects/Matematik/topics?user_id=mehmet")).json()
+    assert [t["id"] for t in mehmet if t["completed"]] == [first]
+
+    summary = {s["name"]: s for s in (await api.get("/api/subjects?user_id=ayse")).json()}
+    assert summary["Matematik"]["completed_topics"] == 1
+    assert summary["Fizik"]["completed_topics"] == 0
+
+    # The global (unscoped) state is untouched
+    assert not any(t["completed"] for t in (await api.get("/api/subjects/Matematik/topics")).json())
+
+    progress = await server.db.progress.find_one({"user_id": "ayse", "subject": "Matematik"})
+    assert progress["bits"] == 1 << server.topic_index["Matematik"][last]
+
+
+@pytest.mark.anyio
+async def test_user_toggle_unknown_topic(api):
+    response = await api.put("/api/subjects/Matematik/topics/x?user_id=ayse", json={"completed": True})
+    assert response.status_code == 404
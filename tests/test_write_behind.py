@@ -0,0 +1,181 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from cache import SubjectCache
+from storage import MemoryStorage
+from writebehind import WriteBehindBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, batch):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append([(change["topic_id"], change["completed"]) for change in batch])
+
+
+async def test_repeated_flips_are_coalesced():
+    write = Recorder()
+    buffer = WriteBehindBuffer(write, interval=60)
+
+    buffer.put("Fizik", "a", True, current=False)
+    buffer.put("Fizik", "a", False, current=True)
+    buffer.put("Fizik", "b", True, current=False)
+    buffer.put("Fizik", "c", True, current=False)
+    buffer.put("Fizik", "c", False, current=True)
+    buffer.put("Fizik", "c", True, current=False)
+
+    assert buffer.state("Fizik", "a") is None
+    assert buffer.subject_changes("Fizik") == {"b": True, "c": True}
+    assert await buffer.flush() == 2
+    assert write.batches == [[("b", True), ("c", True)]]
+    assert buffer.stats()["coalesced"] == 4
+    assert await buffer.flush() == 0
+
+
+async def test_full_buffer_flushes_before_the_interval():
+    write = Recorder()
+    buffer = WriteBehindBuffer(write, interval=60, max_ops=3)
+    task = asyncio.create_task(buffer.run())
+    try:
+        for topic_id in "abc":
+            buffer.put("Kimya", topic_id, True, current=False)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert write.batches == [[("a", True), ("b", True), ("c", True)]]
+    finally:
+        task.cancel()
+
+
+async def test_failed_flush_keeps_changes():
+    buffer = WriteBehindBuffer(Recorder(fail=True), interval=60)
+    buffer.put("Kimya", "a", True, current=False)
+
+    with pytest.raises(RuntimeError):
+        await buffer.flush()
+
+    assert buffer.state("Kimya", "a") is True
+    buffer.write = Recorder()
+    assert await buffer.flush() == 1
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    engine = MemoryStorage()
+    await engine.prepare(server.CURRICULUM_DATA)
+    monkeypatch.setattr(server, "storage", engine)
+    monkeypatch.setattr(server, "subject_cache", SubjectCache())
+    monkeypatch.setattr(server, "write_buffer", WriteBehindBuffer(server._write_topic_changes, interval=60))
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+
+async def test_reads_see_pending_toggles(api):
+    topics = (await api.get("/api/subjects/Matematik/topics")).json()
+    url = f"/api/subjects/Matematik/topics/{topics[0]['id']}"
+    for completed in (True, False, True):
+        acknowledged = (await api.put(url, json={"completed": completed})).json()
+        assert acknowledged["pending"] is True and acknowledged["revision"] is None
+    await api.put(f"/api/subjects/Matematik/topics/{topics[1]['id']}", json={"completed": True})
+
+    stored = await server.storage.list_topics("Matematik")
+    assert not any(topic["completed"] for topic in stored)
+    # Drop the cache so the reads below have to overlay the buffer on storage
+    server.subject_cache.invalidate("Matematik")
+    listed = (await api.get("/api/subjects/Matematik/topics")).json()
+    assert [topic["completed"] for topic in listed[:3]] == [True, True, False]
+    pending = (await api.get("/api/subjects/Matematik/topics", params={"status": "completed"})).json()
+    assert [topic["id"] for topic in pending] == [topics[0]["id"], topics[1]["id"]]
+    summary = next(s for s in (await api.get("/api/subjects")).json() if s["name"] == "Matematik")
+    assert summary["completed_topics"] == 2
+
+    assert await server.write_buffer.flush() == 2
+    stored = await server.storage.list_topics("Matematik")
+    assert [topic["completed"] for topic in stored[:3]] == [True, True, False]
+    assert all(topic["rev"] > 0 for topic in stored[:2])
+
+
+async def test_shutdown_flushes_the_buffer(api):
+    topic = (await api.get("/api/subjects/Fizik/topics")).json()[0]
+    await api.put(f"/api/subjects/Fizik/topics/{topic['id']}", json={"completed": True})
+    subscription = server.progress_hub.subscribe("Fizik")
+
+    await server.shutdown_db_client()
+
+    assert (await server.storage.list_topics("Fizik"))[0]["completed"] is True
+    event = subscription.queue.get_nowait()
+    assert (event["topic_id"], event["completed"]) == (topic["id"], True)
+    server.progress_hub.unsubscribe(subscription)
+
+
+async def test_flush_does_not_redo_a_toggle_written_elsewhere(api):
+    topics = (await api.get("/api/subjects/Kimya/topics")).json()
+    for topic in topics[:2]:
+        await api.put(f"/api/subjects/Kimya/topics/{topic['id']}", json={"completed": True})
+    # Another worker stores the first toggle before this one flushes
+    elsewhere = await server.storage.set_topic("Kimya", topics[0]["id"], True)
+    subscription = server.progress_hub.subscribe("Kimya")
+
+    assert await server.write_buffer.flush() == 2
+    event = subscription.queue.get_nowait()
+    assert (event["topic_id"], event["completed"]) == (topics[1]["id"], True)
+    assert subscription.queue.empty()
+    server.progress_hub.unsubscribe(subscription)
+    stored = await server.storage.list_topics("Kimya")
+    assert stored[0]["rev"] == elsewhere["revision"] and stored[1]["completed"] is True
+
+
+def test_write_behind_refuses_several_workers(monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BEHIND_MS", 50)
+    monkeypatch.setattr(server, "PROGRESS_EVENTS", False)
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    monkeypatch.setenv("MONGO_URL", "")
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+
+    with pytest.raises(RuntimeError, match="single worker"):
+        server.connect()
+
+
+async def test_mongo_flush_is_one_write_per_subject(db, monkeypatch):
+    monkeypatch.setattr(server, "write_buffer", WriteBehindBuffer(server._write_topic_changes, interval=60))
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        topics = (await http.get("/api/subjects/Biyoloji/topics")).json()
+        for topic in topics[:5]:
+            for completed in (True, False, True):
+                await http.put(f"/api/subjects/Biyoloji/topics/{topic['id']}", json={"completed": completed})
+
+        assert await server.write_buffer.flush() == 5
+        doc = await db.subjects.find_one({"name": "Biyoloji"})
+        assert [topic["completed"] for topic in doc["topics"][:6]] == [True] * 5 + [False]
+        # One write per subject, so the whole flush shares its revision
+        assert [topic["rev"] for topic in doc["topics"][:5]] == [doc["rev"]] * 5
+        assert await db.topic_events.count_documents({}) == 5
+
+
+async def test_mongo_flush_only_applies_to_the_buffered_state(db, monkeypatch):
+    monkeypatch.setattr(server, "write_buffer", WriteBehindBuffer(server._write_topic_changes, interval=60))
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        topics = (await http.get("/api/subjects/Kimya/topics")).json()
+        for topic in topics[:2]:
+            await http.put(f"/api/subjects/Kimya/topics/{topic['id']}", json={"completed": True})
+        # Another worker's toggle lands first; the buffered copy must not stamp over it
+        elsewhere = await server.storage.set_topic("Kimya", topics[0]["id"], True)
+
+        assert await server.write_buffer.flush() == 2
+        doc = await db.subjects.find_one({"name": "Kimya"})
+        assert doc["topics"][0]["rev"] == elsewhere["revision"]
+        assert doc["topics"][1]["completed"] is True and doc["topics"][1]["rev"] == doc["rev"]
+        assert await db.topic_events.distinct("topic_id") == [topics[1]["id"]]
+        listed = (await http.get("/api/subjects/Kimya/topics")).json()
+        assert [topic["completed"] for topic in listed[:3]] == [True, True, False]